@@ -0,0 +1,198 @@
+"""Throughput benchmarks for the exchange and account hot paths.
+
+    python -m benchmarks.run --codes 50 --orders 20000 --ticks 20000 --out bench.json
+
+Every case reports calls per second, p50/p99 latency per call and the peak
+traced memory of a second, separately traced pass. Results are written as
+JSON so runs from different commits can be compared.
+"""
+from benchmarks import synthetic
+from dayuex.server.core.exchange import ExchangeCore
+from dayuex.server.core.account import Account
+from dayuex.server.core.risk import Risk
+from dayuex.module.storage import Cash, Position
+from collections import deque
+from time import perf_counter_ns
+import subprocess
+import tracemalloc
+import argparse
+import platform
+import json
+import sys
+
+
+def exchange_on_order(params):
+    exchange = ExchangeCore()
+    return exchange.on_order, synthetic.make_orders(params.codes, params.orders, params.seed)
+
+
+def loaded_exchange(params):
+    exchange = ExchangeCore()
+    orders = synthetic.make_orders(params.codes, params.orders, params.seed)
+    for order in orders:
+        exchange.on_order(order)
+    return exchange, orders
+
+
+def exchange_on_tick(params):
+    exchange, orders = loaded_exchange(params)
+    on_tick = exchange.on_tick
+
+    def consume(tick):
+        deque(on_tick(tick), 0)
+
+    return consume, list(synthetic.make_ticks(params.codes, params.ticks, params.depth, params.seed))
+
+
+def exchange_on_cancel(params):
+    exchange, orders = loaded_exchange(params)
+    return exchange.on_cancel, synthetic.make_cancels(orders, params.cancel_ratio, params.seed)
+
+
+def new_account(params, risk=None):
+    cash = Cash(1, 10**15)
+    positions = {code: Position(1, code, 10**9, 10**9) for code in params.codes}
+    return Account(1, cash, positions, buy_rate=0.0005, sell_rate=0.0005, risk=risk)
+
+
+def account_on_req_order(params):
+    account = new_account(params)
+    return account.on_req_order, synthetic.make_requests(1, params.codes, params.orders, params.seed)
+
+
+def account_on_req_order_risk(params):
+    # every limit enabled but loose enough to pass, to measure the cost of the checks
+    account = new_account(params, Risk(notional=10**15, position=10**12, exposure=10**18, rate=10**9))
+    return account.on_req_order, synthetic.make_requests(1, params.codes, params.orders, params.seed)
+
+
+def loaded_account(params):
+    account = new_account(params)
+    orders = [account.on_req_order(req) for req in synthetic.make_requests(1, params.codes, params.orders, params.seed)]
+    return account, orders
+
+
+def account_on_trade(params):
+    account, orders = loaded_account(params)
+    return account.on_trade, synthetic.fills(orders)
+
+
+def account_on_cancel(params):
+    account, orders = loaded_account(params)
+    return account.on_cancel, synthetic.make_cancels(orders, params.cancel_ratio, params.seed)
+
+
+CASES = [
+    ("exchange.on_order", "orders", exchange_on_order),
+    ("exchange.on_tick", "ticks", exchange_on_tick),
+    ("exchange.on_cancel", "cancels", exchange_on_cancel),
+    ("account.on_req_order", "orders", account_on_req_order),
+    ("account.on_req_order+risk", "orders", account_on_req_order_risk),
+    ("account.on_trade", "trades", account_on_trade),
+    ("account.on_cancel", "cancels", account_on_cancel),
+]
+
+
+def measure(func, args):
+    latencies = []
+    append = latencies.append
+    clock = perf_counter_ns
+    start = clock()
+    for arg in args:
+        t = clock()
+        func(arg)
+        append(clock() - t)
+    return clock() - start, latencies
+
+
+def peak_memory(setup, params):
+    func, args = setup(params)
+    tracemalloc.start()
+    try:
+        for arg in args:
+            func(arg)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(params, cases=None):
+    results = {}
+    for name, unit, setup in CASES:
+        if cases and name not in cases:
+            continue
+        func, args = setup(params)
+        elapsed, latencies = measure(func, args)
+        latencies.sort()
+        results[name] = {
+            "unit": unit,
+            "count": len(latencies),
+            "seconds": elapsed / 1e9,
+            "rate": len(latencies) / (elapsed / 1e9) if elapsed else 0.0,
+            "p50_us": percentile(latencies, 0.5) / 1e3,
+            "p99_us": percentile(latencies, 0.99) / 1e3,
+            "peak_kb": peak_memory(setup, params) / 1024,
+        }
+    return results
+
+
+def commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--codes", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--ticks", type=int, default=20000)
+    parser.add_argument("--cancel-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--case", action="append", dest="cases", help="run only this case, may be repeated")
+    parser.add_argument("--out", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="print rate changes against a previous JSON result file")
+    args = parser.parse_args(argv)
+
+    params = argparse.Namespace(**vars(args))
+    params.codes = synthetic.make_codes(args.codes)
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("out", "cases", "compare")},
+        "results": run(params, args.cases),
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        for name, result in report["results"].items():
+            print("{:<24}{:>12.0f} {}/s  p50 {:>8.2f}us  p99 {:>8.2f}us  peak {:>10.0f}KB".format(
+                name, result["rate"], result["unit"], result["p50_us"], result["p99_us"], result["peak_kb"]))
+    else:
+        sys.stdout.write(text + "\n")
+    if args.compare:
+        compare(report, args.compare)
+
+
+def compare(report, path):
+    with open(path) as f:
+        previous = json.load(f)
+    print("against {}".format(previous.get("commit")))
+    for name, result in report["results"].items():
+        old = previous["results"].get(name, None)
+        if old and old["rate"]:
+            print("{:<24}{:>+8.1%} rate  {:>+8.1%} p99".format(
+                name, result["rate"] / old["rate"] - 1, result["p99_us"] / old["p99_us"] - 1 if old["p99_us"] else 0))
+
+
+if __name__ == "__main__":
+    main()
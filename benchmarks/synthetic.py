@@ -0,0 +1,77 @@
+from dayuex.module.storage import Order, Trade
+from dayuex.module.request import ReqOrder, CancelOrder
+from dayuex.module.enums import OrderType, BSType
+from datetime import datetime
+import random
+
+
+UNIT = 10**4
+
+
+def make_codes(count):
+    return ["%06d.XSHE" % i for i in range(1, count + 1)]
+
+
+def mid_prices(codes, seed=0):
+    rnd = random.Random(seed)
+    return {code: rnd.randint(5, 100) * UNIT for code in codes}
+
+
+def make_ticks(codes, count, depth=5, seed=0, date=20171018):
+    """Yield ``count`` tick dicts cycling over codes, with a random walk around each mid price."""
+    rnd = random.Random(seed)
+    mids = mid_prices(codes, seed)
+    tick_size = UNIT // 100
+    for i in range(count):
+        code = codes[i % len(codes)]
+        mid = mids[code] = max(mids[code] + rnd.randint(-2, 2) * tick_size, 10 * tick_size)
+        ms = i * 10
+        time = 93000000 + (ms // 60000) * 100000 + (ms // 1000 % 60) * 1000 + ms % 1000
+        yield {
+            'date': date,
+            'code': code,
+            'time': time,
+            'ask': [[mid + (k + 1) * tick_size, rnd.randint(1, 50) * 100] for k in range(depth)],
+            'bid': [[mid - (k + 1) * tick_size, rnd.randint(1, 50) * 100] for k in range(depth)],
+        }
+
+
+def make_orders(codes, count, seed=0, spread=10):
+    """Limit orders priced within ``spread`` ticks of each code's starting mid price."""
+    rnd = random.Random(seed)
+    mids = mid_prices(codes, seed)
+    tick_size = UNIT // 100
+    orders = []
+    for i in range(count):
+        code = rnd.choice(codes)
+        bs_type = BSType.BUY if rnd.random() < 0.5 else BSType.SELL
+        offset = rnd.randint(-spread, spread) * tick_size
+        orders.append(Order(orderID=i, code=code, qty=rnd.randint(1, 20) * 100, price=mids[code] + offset,
+                            orderType=OrderType.LIMIT, bsType=bs_type))
+    return orders
+
+
+def make_cancels(orders, ratio, seed=0):
+    rnd = random.Random(seed)
+    return [CancelOrder(order.accountID, order.orderID) for order in orders if rnd.random() < ratio]
+
+
+def make_requests(accountID, codes, count, seed=0, spread=10):
+    rnd = random.Random(seed)
+    mids = mid_prices(codes, seed)
+    tick_size = UNIT // 100
+    now = datetime(2017, 10, 18, 9, 30)
+    requests = []
+    for i in range(count):
+        code = rnd.choice(codes)
+        bs_type = BSType.BUY if rnd.random() < 0.5 else BSType.SELL
+        price = mids[code] + rnd.randint(-spread, spread) * tick_size
+        requests.append(ReqOrder(accountID, code, rnd.randint(1, 5) * 100, price,
+                                 OrderType.LIMIT, bs_type, now))
+    return requests
+
+
+def fills(orders):
+    """One Trade per accepted order filling it completely at its limit price."""
+    return [Trade(order.accountID, order.orderID, i, order.code, order.qty, order.price,
+                  order.orderType, order.bsType) for i, order in enumerate(orders) if order.unfilled > 0]
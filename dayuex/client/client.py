@@ -0,0 +1,81 @@
+"""asyncio client for dayuex.server.net.
+
+Requests are pipelined: ``send`` returns a future at once and the encoded
+request is written together with every other request sent in the same
+event-loop iteration. Pushed trades arrive on ``updates``.
+"""
+from dayuex.module.wire import frame, frames, REQUEST, RESPONSE
+from collections import deque
+import asyncio
+
+
+class Client(asyncio.Protocol):
+
+    def __init__(self):
+        self.transport = None
+        self.updates = asyncio.Queue()
+        self._pending = deque()
+        self._in = bytearray()
+        self._out = bytearray()
+        self._scheduled = False
+        self._closed = None
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=0):
+        loop = asyncio.get_running_loop()
+        transport, client = await loop.create_connection(cls, host, port)
+        return client
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._closed = asyncio.get_running_loop().create_future()
+
+    def connection_lost(self, exc):
+        self.transport = None
+        while self._pending:
+            future = self._pending.popleft()
+            if not future.done():
+                future.set_exception(exc or ConnectionError("connection closed"))
+        if not self._closed.done():
+            self._closed.set_result(None)
+
+    def data_received(self, data):
+        self._in += data
+        pending = self._pending
+        for flag, obj in frames(self._in):
+            if flag == RESPONSE:
+                future = pending.popleft()
+                if not future.done():
+                    future.set_result(obj)
+            else:
+                self.updates.put_nowait(obj)
+
+    def send(self, req):
+        if self.transport is None:
+            raise ConnectionError("not connected")
+        # framed first: a request that fails to encode raises before it has a future
+        frame(self._out, REQUEST, req)
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        if not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+        return future
+
+    async def request(self, req):
+        return await self.send(req)
+
+    async def requests(self, reqs):
+        return await asyncio.gather(*[self.send(req) for req in reqs])
+
+    def flush(self):
+        self._scheduled = False
+        if self._out and self.transport is not None:
+            self.transport.write(bytes(self._out))
+        self._out.clear()
+
+    async def close(self):
+        if self.transport is not None:
+            self.flush()
+            self.transport.close()
+            await self._closed
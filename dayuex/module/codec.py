@@ -0,0 +1,182 @@
+# encoding:utf-8
+"""Fixed-layout binary codec for Structure subclasses.
+
+The layout of a class is generated from its ``__slots__``: each slot name is
+looked up in ``FIELDS`` to get its kind, and the pack/unpack functions are
+generated once per class. Kinds:
+
+    q       int64
+    d       float64
+    s<n>    utf-8 string padded to n bytes
+    e       enum, stored as its int8 ``.value`` (None as -1)
+    t       time: int8 kind + int64 (datetime as microseconds, or a raw int)
+
+Prices and amounts are int64, the integer units the account core uses; pass
+``price="d"`` to ``Codec`` for float prices. When the plain pack fails a value
+of the wrong numeric type is coerced: an integral float, such as the 0.0
+default price of an Order, packs as int64, while a fractional one raises
+struct.error instead of being rounded.
+"""
+from dayuex.module import request, storage
+from dayuex.module.enums import OrderType, BSType, OrderStatus, CanceledReason
+from datetime import datetime
+import struct
+
+
+FIELDS = {
+    "accountID": "q", "orderID": "q", "tradeID": "q", "qty": "q", "cumQty": "q", "price": "q",
+    "frzAmt": "q", "frzFee": "q", "cumAmt": "q", "cumFee": "q", "canceled": "q", "fee": "q",
+    "available": "q", "frozen": "q", "origin": "q", "today": "q", "todaySell": "q",
+    "code": "s16", "info": "s32",
+    "orderType": "e", "bsType": "e", "orderStatus": "e", "reason": "e",
+    "time": "t", "cnfmTime": "t",
+}
+
+ENUMS = {"orderType": OrderType, "bsType": BSType, "orderStatus": OrderStatus, "reason": CanceledReason}
+
+NO_TIME = 0
+DATETIME = 1
+RAW_TIME = 2
+
+
+def pack_time(value):
+    if value is None:
+        return NO_TIME, 0
+    if isinstance(value, datetime):
+        return DATETIME, int(value.timestamp() * 1000000)
+    return RAW_TIME, int(value)
+
+
+def unpack_time(kind, value):
+    if kind == DATETIME:
+        return datetime.fromtimestamp(value / 1000000)
+    if kind == RAW_TIME:
+        return value
+    return None
+
+
+def as_int(value):
+    if value.__class__ is float:
+        if not value.is_integer():
+            raise struct.error("{!r} is not an integral value".format(value))
+        return int(value)
+    return value
+
+
+def enum_value(value):
+    if value is None:
+        return -1
+    return getattr(value, "value", value)
+
+
+class Codec(object):
+
+    def __init__(self, cls, **kinds):
+        self.cls = cls
+        self.fields = [(name, kinds.get(name, FIELDS[name])) for name in cls.__slots__]
+        fmt = ["<"]
+        args = []
+        coerced = []
+        pre = []
+        targets = []
+        sets = []
+        namespace = {"pack_time": pack_time, "unpack_time": unpack_time, "enum_value": enum_value, "as_int": as_int,
+                     "cls": cls, "struct_error": struct.error}
+        for i, (name, kind) in enumerate(self.fields):
+            if kind == "t":
+                fmt.append("bq")
+                pre.append("    k{0}, v{0} = pack_time(obj.{1})".format(i, name))
+                args.append("k{0}, v{0}".format(i))
+                coerced.append(args[-1])
+                targets.append("k{0}, v{0}".format(i))
+                sets.append("    obj.{1} = unpack_time(k{0}, v{0})".format(i, name))
+            elif kind == "e":
+                fmt.append("b")
+                args.append("enum_value(obj.{})".format(name))
+                coerced.append(args[-1])
+                targets.append("v{}".format(i))
+                namespace["E{}".format(i)] = {member.value: member for member in ENUMS[name]}
+                sets.append("    obj.{1} = E{0}.get(v{0}, v{0})".format(i, name))
+            elif kind.startswith("s"):
+                fmt.append(kind[1:] + "s")
+                args.append("obj.{}.encode()".format(name))
+                coerced.append(args[-1])
+                targets.append("v{}".format(i))
+                sets.append("    obj.{1} = v{0}.rstrip(b'\\0').decode()".format(i, name))
+            else:
+                fmt.append(kind)
+                args.append("obj.{}".format(name))
+                coerced.append("{}(obj.{})".format("as_int" if kind == "q" else "float", name))
+                targets.append("v{}".format(i))
+                sets.append("    obj.{1} = v{0}".format(i, name))
+        self.struct = struct.Struct("".join(fmt))
+        self.size = self.struct.size
+        namespace["pack_struct"] = self.struct.pack_into
+        namespace["unpack_struct"] = self.struct.unpack_from
+        source = "\n".join(
+            ["def pack_into(buffer, offset, obj):"] + pre +
+            ["    try:",
+             "        pack_struct(buffer, offset, {})".format(", ".join(args)),
+             "    except struct_error:",
+             "        pack_struct(buffer, offset, {})".format(", ".join(coerced)),
+             "",
+             "def unpack_from(buffer, offset=0):",
+             "    {}, = unpack_struct(buffer, offset)".format(", ".join(targets)),
+             "    obj = cls.__new__(cls)"] + sets +
+            ["    return obj"]
+        )
+        exec(source, namespace)
+        self.pack_into = namespace["pack_into"]
+        self.unpack_from = namespace["unpack_from"]
+
+    def pack(self, obj):
+        buffer = bytearray(self.size)
+        self.pack_into(buffer, 0, obj)
+        return bytes(buffer)
+
+    def unpack(self, data):
+        return self.unpack_from(data, 0)
+
+    def pack_many(self, objs, buffer=None, offset=0):
+        """Pack objects back to back into ``buffer`` and return the offset after the last one.
+
+        ``buffer`` must be a writable bytearray or memoryview with room for
+        every object; when None a bytearray of the right size is allocated
+        and returned instead of the offset.
+        """
+        if buffer is None:
+            objs = list(objs)
+            buffer = bytearray(self.size * len(objs))
+            self.pack_many(objs, buffer)
+            return buffer
+        pack_into = self.pack_into
+        size = self.size
+        for obj in objs:
+            pack_into(buffer, offset, obj)
+            offset += size
+        return offset
+
+    def unpack_many(self, buffer, count=None, offset=0):
+        size = self.size
+        if count is None:
+            count = (len(buffer) - offset) // size
+        unpack_from = self.unpack_from
+        return [unpack_from(buffer, offset + i * size) for i in range(count)]
+
+
+CLASSES = [
+    request.ReqOrder, request.CancelOrder, request.QryOrder, request.QryTrade, request.QryCash,
+    request.QryPosition, request.Snapshot,
+    storage.Order, storage.Trade, storage.Cash, storage.Position,
+]
+
+_codecs = {}
+
+
+def codec(cls):
+    """The shared Codec of a Structure class, generated on first use."""
+    try:
+        return _codecs[cls]
+    except KeyError:
+        result = _codecs[cls] = Codec(cls)
+        return result
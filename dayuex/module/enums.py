@@ -14,6 +14,8 @@ class OrderType(Enum):
     NONE = -1
     LIMIT = 0
     MARKET = 1
+    IOC = 2
+    FOK = 3
 
 
 class OrderStatus(Enum):
@@ -32,3 +34,30 @@ class CanceledReason(Enum):
     POSITION = 3
     MISSING = 4
     ERROR = 5
+    EXPIRED = 6
+    NOTIONAL = 7
+    POSITION_LIMIT = 8
+    EXPOSURE = 9
+    RATE = 10
+    THROTTLE = 11
+    PRICE = 12
+
+
+class EventType(Enum):
+
+    NONE = -1
+    ORDER = 0
+    TRADE = 1
+    CASH = 2
+    POSITION = 3
+
+
+class TradeReject(Enum):
+
+    NONE = -1
+    ORDER = 0
+    QTY = 1
+    AMOUNT = 2
+    FEE = 3
+    CASH = 4
+    POSITION = 5
@@ -200,6 +200,7 @@ class Position(Structure):
         self.available += self.frozen + self.today
         self.frozen = 0
         self.today = 0
+        self.todaySell = 0
         self.origin = self.available
 
 class PositionFreezeExceed(Exception):
@@ -0,0 +1,82 @@
+# encoding:utf-8
+"""Length-prefixed framing shared by the network server and client.
+
+Each frame is ``HEADER`` (payload length, flag, type tag) followed by the
+payload: one Structure in its dayuex.module.codec layout, raw bytes for
+``BYTES`` or nothing for ``NONE``. A list of Structures of one class (the
+trades of a QryTrade) has its class tag or'ed with ``MANY`` and the objects
+packed back to back; an empty list is ``MANY`` alone. ``REQUEST`` frames go from client to
+server, ``RESPONSE`` frames answer them in the order they were sent on the
+connection and ``UPDATE`` frames are pushed trades.
+"""
+from dayuex.module.codec import CLASSES, codec
+import struct
+
+
+HEADER = struct.Struct("<IBB")
+RESPONSE = 0
+UPDATE = 1
+REQUEST = 2
+
+NONE = 0
+MANY = 128
+BYTES = 255
+TAGS = {cls: tag for tag, cls in enumerate(CLASSES, 1)}
+CODECS = {tag: codec(cls) for cls, tag in TAGS.items()}
+
+
+def frame(buffer, flag, obj):
+    """Append one encoded frame to a bytearray."""
+    if obj is None:
+        buffer += HEADER.pack(0, flag, NONE)
+    elif isinstance(obj, (bytes, bytearray)):
+        buffer += HEADER.pack(len(obj), flag, BYTES)
+        buffer += obj
+    elif isinstance(obj, list):
+        if not obj:
+            buffer += HEADER.pack(0, flag, MANY)
+            return
+        tag = TAGS[obj[0].__class__]
+        coder = CODECS[tag]
+        size = coder.size * len(obj)
+        data = bytearray(HEADER.size + size)
+        HEADER.pack_into(data, 0, size, flag, tag | MANY)
+        coder.pack_many(obj, data, HEADER.size)
+        buffer += data
+    else:
+        tag = TAGS[obj.__class__]
+        coder = CODECS[tag]
+        # packed aside first, so a failure leaves ``buffer`` untouched
+        data = bytearray(HEADER.size + coder.size)
+        HEADER.pack_into(data, 0, coder.size, flag, tag)
+        coder.pack_into(data, HEADER.size, obj)
+        buffer += data
+
+
+def frames(buffer):
+    """Pop every complete frame off the front of a bytearray as (flag, obj)."""
+    messages = []
+    offset = 0
+    end = len(buffer)
+    while end - offset >= HEADER.size:
+        length, flag, tag = HEADER.unpack_from(buffer, offset)
+        start = offset + HEADER.size
+        if end - start < length:
+            break
+        if tag == NONE:
+            obj = None
+        elif tag == BYTES:
+            obj = bytes(buffer[start:start + length])
+        elif tag & MANY:
+            tag &= ~MANY
+            if tag == NONE:
+                obj = []
+            else:
+                coder = CODECS[tag]
+                obj = coder.unpack_many(buffer, length // coder.size, start)
+        else:
+            obj = CODECS[tag].unpack_from(buffer, start)
+        messages.append((flag, obj))
+        offset = start + length
+    del buffer[:offset]
+    return messages
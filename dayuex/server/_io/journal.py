@@ -0,0 +1,203 @@
+"""Append-only binary journal of what the accounts applied, and its replay.
+
+Every record has the same fixed layout (``RECORD``) whatever its kind:
+
+    kind bsType orderType timeKind | accountID orderID tradeID | code | a b c d e time | x y
+
+    OPEN      a=cash available, b=cash frozen, x=buy rate, y=sell rate
+    POSITION  code, a=origin, b=available, c=frozen, d=today, e=todaySell
+    ORDER     orderID, code, bsType, orderType, a=qty, b=price, c=frzAmt, d=frzFee, time
+    CANCEL    orderID
+    TRADE     orderID, tradeID, code, bsType, orderType, a=qty, b=price, c=fee, time
+    DAY_OFF   nothing, every account rolls its positions over to the next day
+    EXPIRE    orderID, canceled at the close
+
+Prices and amounts are stored as int64, like the account core uses them.
+
+Records are numbered from 0 in file order; ``Journal.offset`` is the number
+of the next one. A snapshot taken at that point (see
+dayuex.server._io.snapshot) is brought up to date by replaying the journal
+from there.
+"""
+from dayuex.module.storage import Cash, Position, Order, Trade
+from dayuex.module.request import CancelOrder
+from dayuex.module.enums import BSType, OrderType
+from dayuex.module.codec import pack_time, unpack_time, NO_TIME
+from time import monotonic
+import struct
+import os
+
+
+RECORD = struct.Struct("<bbbbxxxxqqq16sqqqqqqdd")
+
+OPEN = 0
+POSITION = 1
+ORDER = 2
+CANCEL = 3
+TRADE = 4
+DAY_OFF = 5
+EXPIRE = 6
+
+EMPTY_CODE = b""
+
+
+class Journal(object):
+    """Writes journal records into a preallocated buffer and commits them in groups.
+
+    A group is written and fsync'ed once ``group`` records are buffered or
+    ``interval`` seconds passed since the last commit, whichever comes first.
+    The interval is only checked as records are written; the loop driving
+    the journal calls ``commit_due`` periodically so a quiet period does not
+    leave records buffered (Engine.run after every tick, the network server
+    on a timer). Records buffered at a crash are lost; a torn record at the
+    end of the file is ignored by ``replay``.
+    """
+
+    def __init__(self, path, group=1024, interval=0.05, sync=True):
+        self.path = path
+        self.group = group
+        self.interval = interval
+        self.sync = sync
+        self._file = open(path, "ab")
+        self._buffer = bytearray(RECORD.size * group)
+        self._view = memoryview(self._buffer)
+        self._count = 0
+        self._base = os.path.getsize(path) // RECORD.size
+        self._last = monotonic()
+
+    @property
+    def offset(self):
+        """Number of records written so far, buffered ones included."""
+        return self._base + self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self, account):
+        cash = account._cash
+        self._write(OPEN, 0, 0, NO_TIME, account.accountID, 0, 0, EMPTY_CODE,
+                    cash.available, cash.frozen, 0, 0, 0, 0, account.br, account.sr)
+        for position in account._positions.values():
+            self._write(POSITION, 0, 0, NO_TIME, account.accountID, 0, 0, position.code.encode(),
+                        position.origin, position.available, position.frozen, position.today,
+                        position.todaySell, 0, 0.0, 0.0)
+
+    def order(self, order):
+        kind, time = pack_time(order.time)
+        self._write(ORDER, order.bsType.value, order.orderType.value, kind, order.accountID, order.orderID, 0,
+                    order.code.encode(), order.qty, order.price, order.frzAmt, order.frzFee, 0, time, 0.0, 0.0)
+
+    def cancel(self, order):
+        self._write(CANCEL, 0, 0, NO_TIME, order.accountID, order.orderID, 0, EMPTY_CODE,
+                    0, 0, 0, 0, 0, 0, 0.0, 0.0)
+
+    def expire(self, order):
+        self._write(EXPIRE, 0, 0, NO_TIME, order.accountID, order.orderID, 0, EMPTY_CODE,
+                    0, 0, 0, 0, 0, 0, 0.0, 0.0)
+
+    def day_off(self):
+        self._write(DAY_OFF, 0, 0, NO_TIME, 0, 0, 0, EMPTY_CODE, 0, 0, 0, 0, 0, 0, 0.0, 0.0)
+
+    def trade(self, trade):
+        kind, time = pack_time(trade.time)
+        self._write(TRADE, trade.bsType.value, trade.orderType.value, kind, trade.accountID, trade.orderID,
+                    trade.tradeID, trade.code.encode(), trade.qty, trade.price, trade.fee, 0, 0, time, 0.0, 0.0)
+
+    def _write(self, *fields):
+        RECORD.pack_into(self._buffer, self._count * RECORD.size, *fields)
+        self._count += 1
+        if self._count >= self.group or monotonic() - self._last >= self.interval:
+            self.commit()
+
+    def commit(self):
+        if self._count:
+            self._file.write(self._view[:self._count * RECORD.size])
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+            self._base += self._count
+            self._count = 0
+        self._last = monotonic()
+
+    def commit_due(self):
+        """Commit the buffered records if ``interval`` passed since the last commit."""
+        if self._count and monotonic() - self._last >= self.interval:
+            self.commit()
+            return True
+        return False
+
+    def close(self):
+        if not self._file.closed:
+            self.commit()
+            self._file.close()
+
+
+def records(path, start=0):
+    with open(path, "rb") as f:
+        f.seek(start * RECORD.size)
+        data = f.read()
+    return RECORD.iter_unpack(memoryview(data)[:len(data) - len(data) % RECORD.size])
+
+
+def replay(path, accounts=None, factory=None, start=0):
+    """Rebuild accounts from a journal and return them as {accountID: Account}.
+
+    ``accounts`` may already hold accounts restored from snapshots taken at
+    journal offset ``start``; the records from ``start`` on are applied on top
+    of them, and an OPEN record for one of them keeps the restored account.
+    ``factory(accountID, cash, buy_rate, sell_rate)`` builds the account for
+    any other OPEN record, ``Account`` by default.
+    """
+    if factory is None:
+        from dayuex.server.core.account import Account
+
+        def factory(accountID, cash, buy_rate, sell_rate):
+            return Account(accountID, cash, buy_rate=buy_rate, sell_rate=sell_rate)
+
+    accounts = accounts if isinstance(accounts, dict) else {}
+    restored = set(accounts)
+    codes = {}
+    bs_types = {member.value: member for member in BSType}
+    order_types = {member.value: member for member in OrderType}
+    last_ids = {}
+
+    for kind, bs, ot, time_kind, accountID, orderID, tradeID, raw, a, b, c, d, e, time, x, y in records(path, start):
+        try:
+            code = codes[raw]
+        except KeyError:
+            code = codes[raw] = raw.rstrip(b"\0").decode()
+        if kind == TRADE:
+            accounts[accountID].on_trade(Trade(
+                accountID, orderID, tradeID, code, a, b, order_types[ot], bs_types[bs], c,
+                time=unpack_time(time_kind, time)
+            ))
+        elif kind == ORDER:
+            accounts[accountID].on_order(Order(
+                accountID, orderID, code, a, price=b, orderType=order_types[ot], bsType=bs_types[bs],
+                frzAmt=c, frzFee=d, time=unpack_time(time_kind, time)
+            ))
+            if orderID > last_ids.get(accountID, 0):
+                last_ids[accountID] = orderID
+        elif kind == CANCEL:
+            accounts[accountID].on_cancel(CancelOrder(accountID, orderID))
+        elif kind == EXPIRE:
+            accounts[accountID].expire([orderID])
+        elif kind == DAY_OFF:
+            for account in accounts.values():
+                for position in account._positions.values():
+                    position.day_off()
+        elif kind == POSITION:
+            if accountID not in restored:
+                accounts[accountID]._positions[code] = Position(accountID, code, a, b, c, d, e)
+        elif kind == OPEN:
+            if accountID not in restored:
+                accounts[accountID] = factory(accountID, Cash(accountID, a, b), x, y)
+
+    for accountID, orderID in last_ids.items():
+        ids = accounts[accountID]._id
+        if hasattr(ids, "skip"):
+            ids.skip(orderID)
+    return accounts
@@ -0,0 +1,154 @@
+"""Compact columnar snapshots of an account's cash, positions and open orders.
+
+Layout, little endian:
+
+    HEADER     magic, version, incremental flag, accountID, journal offset,
+               cash available/frozen, buy/sell rate, position count, order count,
+               closed order count
+    positions  code 16s * n, then one int64 column per POSITION_COLUMNS field
+    orders     orderID, code 16s * n, one int64 column per ORDER_COLUMNS field,
+               one int8 column per ORDER_ENUMS field, time kind int8 and time int64
+    closed     orderIDs which are no longer open (incremental snapshots only)
+
+A full snapshot holds every open order. An incremental one holds the
+positions and orders touched since the previous snapshot; orders that were
+filled or canceled since then are listed as closed.
+
+The journal offset is the ``Journal.offset`` the snapshot was taken at (0
+without a journal): ``replay(path, {accountID: restored}, start=offset(data))``
+applies only what happened after it.
+"""
+from dayuex.module.codec import pack_time, unpack_time
+from dayuex.module.storage import Cash, Position, Order
+from dayuex.module.enums import OrderType, BSType, OrderStatus, CanceledReason
+from array import array
+import struct
+
+
+MAGIC = b"DYSN"
+VERSION = 2
+HEADER = struct.Struct("<4sBBxxqqqqddIII")
+CODE = 16
+
+POSITION_COLUMNS = ["origin", "available", "frozen", "today", "todaySell"]
+ORDER_COLUMNS = ["qty", "cumQty", "price", "frzAmt", "frzFee", "cumAmt", "cumFee", "canceled"]
+ORDER_ENUMS = [("orderType", OrderType), ("bsType", BSType), ("orderStatus", OrderStatus),
+               ("reason", CanceledReason)]
+
+
+def dump(account, incremental=False, offset=0):
+    if incremental:
+        positions = [account._positions[code] for code in account._dirty_positions if code in account._positions]
+        touched = [account._orders.get(orderID, None) for orderID in account._dirty_orders]
+        orders = [order for order in touched if order is not None and order.unfilled > 0]
+        closed = [orderID for orderID, order in zip(account._dirty_orders, touched)
+                  if order is None or order.unfilled <= 0]
+    else:
+        positions = list(account._positions.values())
+        orders = [order for order in account._orders.values() if order.unfilled > 0]
+        closed = []
+
+    cash = account._cash
+    chunks = [HEADER.pack(MAGIC, VERSION, bool(incremental), account.accountID, offset, cash.available,
+                          cash.frozen, account.br, account.sr, len(positions), len(orders), len(closed))]
+    chunks.append(codes(positions))
+    for name in POSITION_COLUMNS:
+        chunks.append(array("q", [getattr(position, name) for position in positions]).tobytes())
+
+    chunks.append(array("q", [order.orderID for order in orders]).tobytes())
+    chunks.append(codes(orders))
+    for name in ORDER_COLUMNS:
+        chunks.append(array("q", [getattr(order, name) for order in orders]).tobytes())
+    for name, enum in ORDER_ENUMS:
+        chunks.append(array("b", [getattr(order, name).value for order in orders]).tobytes())
+    times = [pack_time(order.time) for order in orders]
+    chunks.append(array("b", [kind for kind, value in times]).tobytes())
+    chunks.append(array("q", [value for kind, value in times]).tobytes())
+
+    chunks.append(array("q", closed).tobytes())
+    return b"".join(chunks)
+
+
+def offset(data):
+    """The journal offset a snapshot was taken at."""
+    return HEADER.unpack_from(data)[4]
+
+
+def codes(items):
+    return b"".join(item.code.encode().ljust(CODE, b"\0") for item in items)
+
+
+class Reader(object):
+
+    def __init__(self, data, offset):
+        self.view = memoryview(data)
+        self.offset = offset
+
+    def column(self, typecode, count):
+        column = array(typecode)
+        end = self.offset + column.itemsize * count
+        column.frombytes(self.view[self.offset:end])
+        self.offset = end
+        return column
+
+    def codes(self, count):
+        end = self.offset + CODE * count
+        raw = self.view[self.offset:end].tobytes()
+        self.offset = end
+        return [raw[i:i + CODE].rstrip(b"\0").decode() for i in range(0, len(raw), CODE)]
+
+
+def restore(data, account=None):
+    """Load a snapshot into ``account`` and return it.
+
+    A full snapshot replaces the account's cash, positions and orders, and
+    builds a new Account when none is given. An incremental snapshot is
+    applied on top of the state ``account`` was restored to before.
+    """
+    magic, version, incremental, accountID, start, available, frozen, br, sr, n_pos, n_ord, n_closed = \
+        HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a version {} account snapshot".format(VERSION))
+    if account is None:
+        if incremental:
+            raise ValueError("an incremental snapshot needs the account it applies to")
+        from dayuex.server.core.account import Account
+
+        account = Account(accountID)
+    elif account.accountID != accountID:
+        raise ValueError("snapshot of account {} applied to {}".format(accountID, account.accountID))
+
+    account._cash = Cash(accountID, available, frozen)
+    account.br = br
+    account.sr = sr
+    if not incremental:
+        account._positions = {}
+        account._orders = {}
+
+    reader = Reader(data, HEADER.size)
+    position_codes = reader.codes(n_pos)
+    columns = [reader.column("q", n_pos) for name in POSITION_COLUMNS]
+    for code, values in zip(position_codes, zip(*columns)):
+        account._positions[code] = Position(accountID, code, *values)
+
+    order_ids = reader.column("q", n_ord)
+    order_codes = reader.codes(n_ord)
+    columns = [reader.column("q", n_ord) for name in ORDER_COLUMNS]
+    enums = [[enum(value) for value in reader.column("b", n_ord)] for name, enum in ORDER_ENUMS]
+    time_kinds = reader.column("b", n_ord)
+    times = reader.column("q", n_ord)
+    names = ORDER_COLUMNS + [name for name, enum in ORDER_ENUMS]
+    for i, orderID in enumerate(order_ids):
+        order = Order(accountID, orderID, order_codes[i], time=unpack_time(time_kinds[i], times[i]))
+        for name, column in zip(names, columns + enums):
+            setattr(order, name, column[i])
+        account._orders[orderID] = order
+
+    for orderID in reader.column("q", n_closed):
+        account._orders.pop(orderID, None)
+
+    account._dirty_positions.clear()
+    account._dirty_orders.clear()
+    if order_ids and hasattr(account._id, "skip"):
+        account._id.skip(max(order_ids))
+    return account
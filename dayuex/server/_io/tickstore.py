@@ -0,0 +1,137 @@
+"""Columnar on-disk tick store and a memory-mapped reader for replay.
+
+File layout, little endian:
+
+    HEADER      magic, version, depth, code count, tick count, price scale
+    codes       code count * 16s
+    date        int64 * count        (yyyymmdd)
+    time        int64 * count        (HHMMSSmmm)
+    code        int32 * count        (index into the code table)
+    ask, bid    int64 * count * depth * 2   ([price, volume] per level)
+
+Prices are stored as ``round(price * scale)``, so orders replayed against a
+store must use the same integer price unit. Missing ask levels are padded
+with volume 0 at a price no buy order reaches, missing bid levels with
+volume 0 at price 0.
+"""
+from dayuex.server.core.exchange import CODE, ASK, BID, DATE, TIME
+import numpy as np
+import struct
+import json
+
+
+MAGIC = b"DYTK"
+VERSION = 1
+HEADER = struct.Struct("<4sBxxxIIqq")
+CODE_SIZE = 16
+NO_ASK = np.iinfo(np.int64).max
+
+
+class TickView(object):
+    """A tick backed by the memory map, usable wherever a tick dict is.
+
+    ``ask`` and ``bid`` are (depth, 2) views into the mapped file, not copies.
+    """
+
+    __slots__ = ["date", "time", "code", "ask", "bid"]
+
+    def __init__(self, date, time, code, ask, bid):
+        self.date = date
+        self.time = time
+        self.code = code
+        self.ask = ask
+        self.bid = bid
+
+    def __getitem__(self, item):
+        return getattr(self, item)
+
+
+class TickReader(object):
+
+    def __init__(self, path, chunk=4096):
+        self.path = path
+        self.chunk = chunk
+        with open(path, "rb") as f:
+            magic, version, depth, n_codes, count, scale = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("{} is not a version {} tick store".format(path, VERSION))
+            raw = f.read(CODE_SIZE * n_codes)
+        self.depth = depth
+        self.scale = scale
+        self.codes = [raw[i:i + CODE_SIZE].rstrip(b"\0").decode() for i in range(0, len(raw), CODE_SIZE)]
+        self._count = count
+
+        offset = HEADER.size + CODE_SIZE * n_codes
+        self.date = np.memmap(path, "<i8", "r", offset, (count,))
+        offset += 8 * count
+        self.time = np.memmap(path, "<i8", "r", offset, (count,))
+        offset += 8 * count
+        self.code = np.memmap(path, "<i4", "r", offset, (count,))
+        offset += 4 * count
+        self.ask = np.memmap(path, "<i8", "r", offset, (count, depth, 2))
+        offset += 16 * depth * count
+        self.bid = np.memmap(path, "<i8", "r", offset, (count, depth, 2))
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        codes = self.codes
+        ask = self.ask
+        bid = self.bid
+        for start in range(0, self._count, self.chunk):
+            end = min(start + self.chunk, self._count)
+            dates = self.date[start:end].tolist()
+            times = self.time[start:end].tolist()
+            code_index = self.code[start:end].tolist()
+            for i in range(end - start):
+                yield TickView(dates[i], times[i], codes[code_index[i]], ask[start + i], bid[start + i])
+
+
+def write(path, ticks, depth=5, scale=10000):
+    """Write tick dicts (as consumed by ExchangeCore.on_tick) into a tick store."""
+    codes = {}
+    dates = []
+    times = []
+    code_index = []
+    ask = []
+    bid = []
+    empty_ask = [NO_ASK, 0]
+    empty_bid = [0, 0]
+    for tick in ticks:
+        dates.append(tick[DATE])
+        times.append(tick[TIME])
+        code_index.append(codes.setdefault(tick[CODE], len(codes)))
+        ask.append(levels(tick[ASK], depth, scale, empty_ask))
+        bid.append(levels(tick[BID], depth, scale, empty_bid))
+
+    count = len(dates)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, depth, len(codes), count, scale))
+        f.write(b"".join(code.encode().ljust(CODE_SIZE, b"\0") for code in codes))
+        f.write(np.array(dates, "<i8").tobytes())
+        f.write(np.array(times, "<i8").tobytes())
+        f.write(np.array(code_index, "<i4").tobytes())
+        f.write(np.array(ask, "<i8").reshape(count, depth, 2).tobytes())
+        f.write(np.array(bid, "<i8").reshape(count, depth, 2).tobytes())
+    return count
+
+
+def levels(quotes, depth, scale, empty):
+    result = [[int(round(price * scale)), int(volume)] for price, volume in quotes[:depth]]
+    result.extend([empty] * (depth - len(result)))
+    return result
+
+
+def convert_json(source, target, depth=5, scale=10000):
+    """Convert a JSON array, or JSON lines, of tick dicts into a tick store."""
+    with open(source) as f:
+        head = f.read(1)
+        while head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == "[":
+            ticks = json.load(f)
+        else:
+            ticks = (json.loads(line) for line in f if line.strip())
+        return write(target, ticks, depth, scale)
@@ -1,64 +1,99 @@
 from dayuex.module.storage import Cash, Order, Position
-from dayuex.module.enums import OrderStatus, BSType, CanceledReason
+from dayuex.module.enums import OrderStatus, OrderType, BSType, CanceledReason, TradeReject
+from dayuex.server.core.ids import BlockIDGenerator
+from dayuex.server.core.history import TradeHistory, OrderHistory
+from dayuex.server.core.rejects import RejectLog
+from dayuex.server._io.snapshot import dump as dump_snapshot
+from datetime import datetime
 import logging
+import time
+
+
+BUY = BSType.BUY.value
+NO_REJECT = TradeReject.NONE
 
 
-class AccountOrderIDGenerator(object):
+class AccountOrderIDGenerator(BlockIDGenerator):
 
-    def __init__(self, accountID, ps_log=6):
+    def __init__(self, accountID, ps_log=6, block=1024, clock=time.time):
         self.accountID = accountID
         self.ps_log = ps_log
         self.time_expand = 2**ps_log
-        self.head = self.accountID*(2**32)*self.time_expand
-        self.last = 0
-
-    def __iter__(self):
-        return self
-
-    def __next__(self):
-        return self.next()
-
-    def next(self):
-        last = self.head + int(datetime.now().timestamp()*self.time_expand)
-        if last > self.last:
-            self.last = last
-            return last
-        else:
-            self.last += 1
-            return self.last
+        super(AccountOrderIDGenerator, self).__init__(
+            0, self.time_expand, block, clock, self.accountID*(2**32)*self.time_expand
+        )
 
 
 class Account(object):
-
-    def __init__(self, accountID=0, cash=None, positions=None, orders=None, trades=None, buy_rate=0, sell_rate=0):
+    """Cash, positions and orders of one account.
+
+    ``_orders`` is the working set of orders that can still trade. Filled,
+    canceled and rejected orders are archived into the columnar ``_history``
+    and every applied trade is appended to ``_trades`` (see
+    dayuex.server.core.history); ``retain`` bounds how many rows of each are
+    kept, None keeps everything.
+
+    A ``risk`` (see dayuex.server.core.risk) checks every requested order
+    before anything is frozen and is kept up to date on orders, trades and
+    cancels.
+
+    The price of a market buy is its collar, the worst price it may fill at:
+    it is frozen and risk-checked like a limit order, and a market buy without
+    one is rejected with CanceledReason.PRICE. Engine sets it from the last
+    tick when the request has none (see ExchangeCore.reference_price).
+    """
+
+    def __init__(self, accountID=0, cash=None, positions=None, orders=None, trades=None, buy_rate=0, sell_rate=0,
+                 ids=None, retain=None, risk=None):
         self.accountID = accountID
         self._cash = cash if isinstance(cash, Cash) else Cash()
         self._cash.accountID = self.accountID
-        self._positions = positions if positions else {}
+        self._positions = positions if positions is not None else {}
         self._orders = orders if orders else {}
-        self._trades = trades if trades else {}
+        self._trades = trades if isinstance(trades, TradeHistory) else TradeHistory(self.accountID, retain)
+        self._history = OrderHistory(self.accountID, retain)
         self.br = buy_rate
         self.sr = sell_rate
-        self._id = AccountOrderIDGenerator(self.accountID)
+        self._id = ids if hasattr(ids, "next") else AccountOrderIDGenerator(self.accountID)
+        # touched since the last snapshot, see on_snapshot
+        self._dirty_positions = set()
+        self._dirty_orders = set()
+        self.risk = risk.attach(self) if risk is not None else None
+        self.rejects = RejectLog()
+        # the journal recording this account, set by AccountManager.add
+        self.journal = None
 
     def on_req_order(self, req):
         if req.bsType == BSType.BUY:
             order = create_order(req, self._id.next(), self.br)
-            return self._atomic_buy_order(order)
+            if order.orderType is OrderType.MARKET and order.price <= 0:
+                return self._reject(order, CanceledReason.PRICE)
         else:
             order = create_order(req, self._id.next(), self.sr)
+        if self.risk is not None:
+            reason = self.risk.check(order)
+            if reason is not None:
+                return self._reject(order, reason)
+        if order.bsType == BSType.BUY:
+            return self._atomic_buy_order(order)
+        else:
+            return self._atomic_sell_order(order)
+
+    def on_order(self, order):
+        if order.bsType == BSType.BUY:
+            return self._atomic_buy_order(order)
+        else:
             return self._atomic_sell_order(order)
 
     def _atomic_buy_order(self, order):
         total_frz = order.frzAmt + order.frzFee
         if total_frz > self._cash.available:
-            order.canceled = order.unfilled
-            order.frzAmt = 0
-            order.frzFee = 0
-            order.reason = CanceledReason.CASH
-        else:
-            self._cash.freeze(total_frz)
-            self._orders[order.orderID] = order
+            return self._reject(order, CanceledReason.CASH)
+        self._cash.freeze(total_frz)
+        self._orders[order.orderID] = order
+        self._dirty_orders.add(order.orderID)
+        if self.risk is not None:
+            self.risk.on_order(order)
         return order
 
     def _atomic_sell_order(self, order):
@@ -67,10 +102,20 @@ class Account(object):
         if isinstance(position, Position) and (order.qty <= position.available):
             position.freeze(order.qty)
             self._orders[order.orderID] = order
-        else:
-            order.canceled = order.unfilled
-            order.reason = CanceledReason.POSITION
-
+            self._dirty_orders.add(order.orderID)
+            self._dirty_positions.add(order.code)
+            if self.risk is not None:
+                self.risk.on_order(order)
+            return order
+        return self._reject(order, CanceledReason.POSITION)
+
+    def _reject(self, order, reason):
+        order.canceled = order.unfilled
+        order.frzAmt = 0
+        order.frzFee = 0
+        order.reason = reason
+        order.orderStatus = OrderStatus.CANCELED
+        self._history.append(order)
         return order
 
     def on_cancel(self, cancel):
@@ -81,101 +126,178 @@ class Account(object):
             return Order(self.accountID, reason=CanceledReason.MISSING)
 
         if order.bsType.value == BSType.BUY.value:
-            value = order.frzAmt-order.cumFee+order.frzFee-order.cumFee
+            value = order.frzAmt-order.cumAmt+order.frzFee-order.cumFee
             self._cash.unfreeze(value)
         else:
             position = self._positions.get(order.code)
             position.unfreeze(order.unfilled)
+            self._dirty_positions.add(order.code)
+        if self.risk is not None:
+            self.risk.on_cancel(order)
         self._cancel(order)
+        self._dirty_orders.add(order.orderID)
+        self._archive(order)
         return order
 
+    def expire(self, orderIDs=None):
+        """Cancel every open order, or those in ``orderIDs``, and return them.
+
+        Used at the close and for what is left of market, IOC and FOK orders.
+        Frozen cash is released in one unfreeze for all buy orders.
+        """
+        if orderIDs is None:
+            orders = list(self._orders.values())
+        else:
+            orders = [self._orders[orderID] for orderID in orderIDs if orderID in self._orders]
+        release = 0
+        for order in orders:
+            if order.bsType.value == BSType.BUY.value:
+                release += order.frzAmt-order.cumAmt+order.frzFee-order.cumFee
+            else:
+                self._positions[order.code].unfreeze(order.unfilled)
+                self._dirty_positions.add(order.code)
+            if self.risk is not None:
+                self.risk.on_cancel(order)
+            order.canceled = order.unfilled
+            order.reason = CanceledReason.EXPIRED
+            order.orderStatus = OrderStatus.CANCELED
+            self._dirty_orders.add(order.orderID)
+            self._history.append(order)
+            del self._orders[order.orderID]
+        if release:
+            self._cash.unfreeze(release)
+        return orders
+
     @staticmethod
     def _cancel(order):
         order.canceled = order.unfilled
         order.reason = CanceledReason.CLIENT
+        order.orderStatus = OrderStatus.CANCELED
 
     def on_trade(self, trade):
+        return self.apply_trade(trade) is NO_REJECT
+
+    def apply_trade(self, trade):
+        """Apply a trade and return TradeReject.NONE, or why it was rejected without raising.
+
+        Every check runs before anything changes; rejections are counted and
+        buffered in ``rejects`` instead of logged one by one.
+        """
         order = self._orders.get(trade.orderID, None)
         if order is None:
-            logging.error("on trade | buy | %s | order not found", trade)
-            return False
-        if order.bsType.value == BSType.BUY.value:
-            try:
-                trade.fee = int(trade.price*trade.qty*self.br)
-                return self._atomic_buy_trade(order, trade)
-            except Exception as e:
-                logging.error("on trade | buy | %s | %s | %s", trade, order, e)
-                return False
+            return self._reject_trade(TradeReject.ORDER, trade)
+        if trade.qty <= 0 or trade.qty > order.unfilled:
+            return self._reject_trade(TradeReject.QTY, trade)
+        if order.bsType.value == BUY:
+            return self._atomic_buy_trade(order, trade)
         else:
-            try:
-                return self._atomic_sell_trade(order, trade)
-            except Exception as e:
-                trade.fee = int(trade.price*trade.qty*self.sr)
-                logging.error("on trade | sell | %s | %s | %s", trade, order, e)
-                return False
+            return self._atomic_sell_trade(order, trade)
 
-    def _atomic_buy_trade(self, order, trade):
-        qty, fee, amt = self._check_trade(order, trade)
+    def _reject_trade(self, reason, trade):
+        self.rejects.add(reason, self.accountID, trade)
+        return reason
 
-        self._cash.sub(trade.fee + trade.qty * trade.price)
+    def _atomic_buy_trade(self, order, trade):
+        fee = int(trade.price*trade.qty*self.br)
+        value = trade.qty * trade.price
+        amt = order.cumAmt + value
+        if amt > order.frzAmt:
+            return self._reject_trade(TradeReject.AMOUNT, trade)
+        if order.cumFee + fee > order.frzFee:
+            return self._reject_trade(TradeReject.FEE, trade)
+        if self._cash.frozen < value + fee:
+            return self._reject_trade(TradeReject.CASH, trade)
 
         # ========================== check complete ========================== #
 
+        trade.fee = fee
+        # recorded first, so nothing is half applied if recording fails
+        self._trades.append(trade)
+        self._cash.sub(fee + value)
         position = self._positions.get(trade.code, None)
         if position is None:
-            position = Position(self.accountID, trade.code)
-            self._positions[trade.code] = position
+            # re-read it, _positions may store a copy (see dayuex.server.core.ledger)
+            self._positions[trade.code] = Position(self.accountID, trade.code)
+            position = self._positions[trade.code]
         position.add(trade.qty)
+        self._dirty_positions.add(trade.code)
+        self._dirty_orders.add(order.orderID)
 
-        order.cumQty = qty
-        order.cumFee = fee
+        order.cumQty += trade.qty
+        order.cumFee += fee
         order.cumAmt = amt
+        if self.risk is not None:
+            self.risk.on_trade(order, trade)
 
         if order.unfilled == 0:
             order.orderStatus = OrderStatus.FILLED
             self._cash.unfreeze(order.frzAmt-order.cumAmt+order.frzFee-order.cumFee)
-        return True
+            self._archive(order)
+        return NO_REJECT
 
     def _atomic_sell_trade(self, order, trade):
-        qty, fee, amt = self._check_trade(order, trade)
-        position = self._positions.get(trade.code)
-        position.sub(trade.qty)
+        position = self._positions.get(trade.code, None)
+        if position is None or position.frozen < trade.qty:
+            return self._reject_trade(TradeReject.POSITION, trade)
         # ========================== check complete ========================== #
-        self._cash.add(trade.qty * trade.price - trade.fee)
-        order.cumFee = fee
-        order.cumAmt = amt
-        order.cumQty = qty
+        # a sell may fill above its price, so nothing frozen bounds its amount
+        fee = int(trade.price*trade.qty*self.sr)
+        value = trade.qty * trade.price
+        trade.fee = fee
+        self._trades.append(trade)
+        position.sub(trade.qty)
+        self._dirty_positions.add(trade.code)
+        self._dirty_orders.add(order.orderID)
+        self._cash.add(value - fee)
+        order.cumFee += fee
+        order.cumAmt += value
+        order.cumQty += trade.qty
+        if self.risk is not None:
+            self.risk.on_trade(order, trade)
         if order.unfilled == 0:
             order.orderStatus = OrderStatus.FILLED
-        return True
+            self._archive(order)
+        return NO_REJECT
 
-    @staticmethod
-    def _check_trade(order, trade):
-        qty = order.cumQty + trade.qty
-        fee = order.cumFee + trade.fee
-        amt = order.cumAmt + trade.qty * trade.price
-        for limit, value in [(order.qty, qty), (order.frzFee, fee), (order.frzAmt, amt)]:
-            if value > limit:
-                raise ValueError("{} > {}".format(value, limit))
-        return qty, fee, amt
+    def _archive(self, order):
+        del self._orders[order.orderID]
+        self._history.append(order)
 
     def on_qry_order(self, qry):
-        return self._orders[qry.orderID]
+        order = self._orders.get(qry.orderID, None)
+        if order is not None:
+            return order
+        if qry.orderID in self._history:
+            return self._history[qry.orderID]
+        logging.error("qry order | %s | order not found", qry)
+        return None
 
     def on_qry_trade(self, qry):
-        return self._trades[qry.orderID]
+        if qry.orderID in self._trades:
+            return self._trades[qry.orderID]
+        logging.error("qry trade | %s | no trades", qry)
+        return None
 
     def on_qry_cash(self, qry):
         return self._cash
 
     def on_qry_position(self, qry):
-        return self._positions[qry.code]
-
-    def on_snapshot(self):
-        pass
-
-
-from datetime import datetime
+        position = self._positions.get(qry.code, None)
+        if position is None:
+            logging.error("qry position | %s | position not found", qry)
+        return position
+
+    def on_snapshot(self, snapshot=None, incremental=False):
+        """Serialize cash, positions and open orders, see dayuex.server._io.snapshot.
+
+        An incremental snapshot only carries the positions and orders touched
+        since the previous snapshot of this account. With a journal its
+        current offset is stored, to replay the journal from.
+        """
+        data = dump_snapshot(self, incremental, 0 if self.journal is None else self.journal.offset)
+        self._dirty_positions.clear()
+        self._dirty_orders.clear()
+        return data
 
 
 def create_order(req, order_id, fee_rate):
@@ -0,0 +1,143 @@
+from dayuex.server.core.exchange import CODE, ASK, BID, DATE, TIME
+from dayuex.module.enums import BSType
+import numpy as np
+
+
+BUY = BSType.BUY.value
+SELL = BSType.SELL.value
+
+
+def tick_dtype(depth=5, code="U16"):
+    return np.dtype([
+        ("date", "i8"), ("time", "i8"), ("code", code),
+        ("askPrice", "f8", (depth,)), ("askVolume", "i8", (depth,)),
+        ("bidPrice", "f8", (depth,)), ("bidVolume", "i8", (depth,)),
+    ])
+
+
+def fill_dtype(code="U16"):
+    return np.dtype([
+        ("tick", "i8"), ("accountID", "i8"), ("orderID", "i8"), ("code", code), ("bsType", "i1"),
+        ("price", "f8"), ("qty", "i8"), ("date", "i8"), ("time", "i8"),
+    ])
+
+
+def tick_array(ticks, depth=5, code="U16"):
+    """Build a structured tick array from tick dicts.
+
+    Missing levels are padded with zero volume at a price no order can cross.
+    """
+    ticks = list(ticks)
+    array = np.zeros(len(ticks), tick_dtype(depth, code))
+    array["askPrice"] = np.inf
+    array["bidPrice"] = -np.inf
+    for row, tick in zip(array, ticks):
+        row["date"] = tick[DATE]
+        row["time"] = tick[TIME]
+        row["code"] = tick[CODE]
+        for side in (ASK, BID):
+            levels = tick[side][:depth]
+            if len(levels):
+                prices, volumes = zip(*levels)
+                row[side + "Price"][:len(levels)] = prices
+                row[side + "Volume"][:len(levels)] = volumes
+    return array
+
+
+def order_columns(orders, code="U16"):
+    orders = list(orders)
+    return {
+        "accountID": np.array([order.accountID for order in orders], "i8"),
+        "orderID": np.array([order.orderID for order in orders], "i8"),
+        "code": np.array([order.code for order in orders], code),
+        "bsType": np.array([order.bsType.value for order in orders], "i1"),
+        "price": np.array([order.price for order in orders], "f8"),
+        "qty": np.array([order.qty for order in orders], "i8"),
+        "cumQty": np.array([order.qty - order.unfilled for order in orders], "i8"),
+    }
+
+
+class BatchMatcher(object):
+    """Replays a batch of ticks against resting orders held as columns.
+
+    ``orders`` is a dict of equally sized arrays (see ``order_columns``) in
+    arrival order; ``cumQty`` is updated in place as orders fill. With
+    ``shared=False`` every order sees the full depth of a tick, like
+    ``Transactor``; with ``shared=True`` the depth is consumed in price-time
+    priority, like ``SharedTransactor``.
+    """
+
+    def __init__(self, orders, shared=False):
+        self.orders = orders
+        self.shared = shared
+        self._books = {}
+        codes = orders["code"]
+        for code in np.unique(codes):
+            on_code = codes == code
+            self._books[code] = (self._side(on_code, BUY, -1), self._side(on_code, SELL, 1))
+
+    def _side(self, on_code, bs_type, sign):
+        index = np.flatnonzero(on_code & (self.orders["bsType"] == bs_type))
+        return index[np.argsort(sign * self.orders["price"][index], kind="stable")]
+
+    def match(self, ticks):
+        fills = []
+        for i, tick in enumerate(ticks):
+            book = self._books.get(tick["code"], None)
+            if book is None:
+                continue
+            for index, prices, volumes, sign in (
+                (book[0], tick["askPrice"], tick["askVolume"], 1),
+                (book[1], tick["bidPrice"], tick["bidVolume"], -1),
+            ):
+                if len(index):
+                    fill = self._match_side(i, tick, index, prices, volumes, sign)
+                    if fill is not None:
+                        fills.append(fill)
+        if fills:
+            return np.concatenate(fills)
+        return np.zeros(0, fill_dtype(self.orders["code"].dtype))
+
+    def _match_side(self, i, tick, index, prices, volumes, sign):
+        orders = self.orders
+        unfilled = orders["qty"][index] - orders["cumQty"][index]
+        live = unfilled > 0
+        index = index[live]
+        unfilled = unfilled[live]
+        # number of leading levels each order crosses: asks up to its limit, bids down to it
+        cross = sign * orders["price"][index][:, None] >= sign * prices[None, :]
+        levels = np.logical_and.accumulate(cross, axis=1).sum(axis=1)
+        if not levels.any():
+            return None
+
+        cum = np.concatenate(([0], np.cumsum(volumes)))
+        cap = cum[levels]
+        if self.shared:
+            # Orders take liquidity from the front of the book one after another, so order k
+            # takes [end[k-1], end[k]) with end[k] = min(end[k-1] + unfilled[k], cap[k]).
+            # caps never increase along price priority, which gives the closed form below.
+            total = np.cumsum(unfilled)
+            end = total + np.minimum(np.minimum.accumulate(cap - total), 0)
+            end = np.maximum.accumulate(np.maximum(end, 0))
+            start = np.concatenate(([0], end[:-1]))
+        else:
+            start = np.zeros_like(unfilled)
+            end = np.minimum(unfilled, cap)
+
+        qty = np.minimum(end[:, None], cum[None, 1:]) - np.maximum(start[:, None], cum[None, :-1])
+        qty = np.maximum(qty, 0)
+        orders["cumQty"][index] += qty.sum(axis=1)
+
+        rows, cols = np.nonzero(qty)
+        fill = np.zeros(len(rows), fill_dtype(orders["code"].dtype))
+        taken = index[rows]
+        fill["tick"] = i
+        fill["accountID"] = orders["accountID"][taken]
+        fill["orderID"] = orders["orderID"][taken]
+        fill["code"] = orders["code"][taken]
+        fill["bsType"] = orders["bsType"][taken]
+        fill["price"] = prices[cols]
+        fill["qty"] = qty[rows, cols]
+        fill["date"] = tick["date"]
+        fill["time"] = tick["time"]
+        return fill
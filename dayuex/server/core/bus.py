@@ -0,0 +1,170 @@
+from dayuex.module.enums import EventType
+from collections import deque
+from threading import Condition
+from time import monotonic
+
+
+DROP = 0
+BLOCK = 1
+COALESCE = 2
+
+
+def default_key(event_type, event):
+    return event_type, event.accountID, getattr(event, "orderID", None), getattr(event, "code", None)
+
+
+class Subscription(object):
+    """A subscriber's bounded buffer of (EventType, event) pairs.
+
+    When the buffer is full, DROP discards the oldest events, BLOCK makes the
+    publisher wait up to ``timeout`` seconds for the consumer (then drops),
+    and COALESCE keeps only the latest event per ``key(event_type, event)``.
+    """
+
+    def __init__(self, types=None, accountID=None, code=None, maxlen=1024, policy=DROP, key=None, timeout=None):
+        self.types = types
+        self.accountID = accountID
+        self.code = code
+        self.maxlen = maxlen
+        self.policy = policy
+        self.key = key if callable(key) else default_key
+        self.timeout = timeout
+        self.dropped = 0
+        self._cond = Condition()
+        if policy == COALESCE:
+            self._buffer = {}
+        elif policy == BLOCK:
+            self._buffer = deque()
+        else:
+            self._buffer = deque(maxlen=maxlen)
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def deliver(self, events):
+        with self._cond:
+            buffer = self._buffer
+            if self.policy == COALESCE:
+                key = self.key
+                for event in events:
+                    k = key(*event)
+                    if k in buffer:
+                        del buffer[k]
+                    elif len(buffer) >= self.maxlen:
+                        del buffer[next(iter(buffer))]
+                        self.dropped += 1
+                    buffer[k] = event
+            elif self.policy == BLOCK:
+                deadline = None if self.timeout is None else monotonic() + self.timeout
+                for i, event in enumerate(events):
+                    while len(buffer) >= self.maxlen:
+                        self._cond.notify_all()
+                        wait = None if deadline is None else deadline - monotonic()
+                        if (wait is not None and wait <= 0) or not self._cond.wait(wait):
+                            self.dropped += len(events) - i
+                            self._cond.notify_all()
+                            return
+                    buffer.append(event)
+            else:
+                overflow = len(buffer) + len(events) - self.maxlen
+                if overflow > 0:
+                    self.dropped += overflow
+                buffer.extend(events)
+            self._cond.notify_all()
+
+    def poll(self, limit=None):
+        """Take up to ``limit`` buffered events without waiting."""
+        with self._cond:
+            events = self._take(limit)
+            if events:
+                self._cond.notify_all()
+            return events
+
+    def get(self, timeout=None, limit=None):
+        """Wait up to ``timeout`` seconds for events and take up to ``limit`` of them."""
+        with self._cond:
+            if not self._buffer:
+                self._cond.wait_for(self.__len__, timeout)
+            events = self._take(limit)
+            if events:
+                self._cond.notify_all()
+            return events
+
+    def _take(self, limit):
+        buffer = self._buffer
+        if self.policy == COALESCE:
+            if limit is None or limit >= len(buffer):
+                events = list(buffer.values())
+                buffer.clear()
+                return events
+            keys = [key for key, i in zip(buffer, range(limit))]
+            return [buffer.pop(key) for key in keys]
+        count = len(buffer) if limit is None else min(limit, len(buffer))
+        return [buffer.popleft() for i in range(count)]
+
+
+class EventBus(object):
+    """In-process publish/subscribe of order, trade, cash and position updates.
+
+    ``publish`` only appends to a pending batch; ``flush`` (called
+    automatically every ``batch`` events) hands each subscriber all of its
+    matching events at once. Subscriptions filter on event types, accountID
+    and code, with None matching anything.
+    """
+
+    def __init__(self, batch=256):
+        self.batch = batch
+        self._pending = []
+        self._index = {}
+
+    def subscribe(self, types=None, accountID=None, code=None, **kwargs):
+        if isinstance(types, EventType):
+            types = (types,)
+        subscription = Subscription(types, accountID, code, **kwargs)
+        for event_type in (types or (None,)):
+            self._index.setdefault((event_type, accountID, code), []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for event_type in (subscription.types or (None,)):
+            key = (event_type, subscription.accountID, subscription.code)
+            subscriptions = self._index.get(key, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+            if not subscriptions:
+                self._index.pop(key, None)
+
+    def publish(self, event_type, event):
+        self._pending.append((event_type, event))
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        index = self._index
+        batches = {}
+        for item in pending:
+            event_type, event = item
+            accountID = event.accountID
+            code = getattr(event, "code", None)
+            if code is None:
+                keys = ((event_type, accountID, None), (event_type, None, None),
+                        (None, accountID, None), (None, None, None))
+            else:
+                keys = ((event_type, accountID, code), (event_type, accountID, None),
+                        (event_type, None, code), (event_type, None, None),
+                        (None, accountID, code), (None, accountID, None),
+                        (None, None, code), (None, None, None))
+            for key in keys:
+                subscriptions = index.get(key, None)
+                if subscriptions:
+                    for subscription in subscriptions:
+                        try:
+                            batches[subscription].append(item)
+                        except KeyError:
+                            batches[subscription] = [item]
+        for subscription, events in batches.items():
+            subscription.deliver(events)
@@ -0,0 +1,233 @@
+from dayuex.server.core.exchange import ExchangeCore, DATE, TIME, IMMEDIATE, INF
+from dayuex.server.core.manager import AccountManager
+from dayuex.module.request import ReqOrder, CancelOrder
+from dayuex.module.storage import Order, Cash, Position
+from dayuex.module.enums import CanceledReason, EventType, OrderType
+from datetime import datetime
+
+
+MARKET = OrderType.MARKET
+
+
+class Engine(object):
+    """Streams ticks and requests through the accounts and the exchange.
+
+    ReqOrder -> Account -> ExchangeCore, and every Trade from
+    ExchangeCore.on_tick -> Account, in one loop. The exchange matches its own
+    copy of each accepted order, so filling it never touches the account's
+    bookkeeping on the Order the account returned.
+
+    With a ``bus`` (see dayuex.server.core.bus) every request result that is
+    an Order is published, and every applied trade is published together with
+    the account's order, cash and position it changed. Published orders, cash
+    and positions are copies, so buffered events keep the state they had. The
+    bus is flushed after each tick and at the end of ``run``.
+
+    Market, IOC and FOK orders fill against the last tick of their code as
+    they are accepted, and what is left of them is expired right away. Their
+    trades are collected in ``fills`` until ``take_fills``: ``run`` yields
+    them after the order, the network server pushes them to its clients. A
+    market order sent without a price gets the one its qty would reach on
+    that tick (ExchangeCore.reference_price), which the account freezes and
+    risk-checks; without a tick a market buy is rejected for its price.
+
+    With a journal on the AccountManager, ``run`` lets it commit what is due
+    after every tick (see Journal.commit_due).
+
+    In ``run`` an account throttle is driven by the simulated time:
+    ``seconds`` turns a tick or request time into the throttle's seconds,
+    ``to_seconds`` by default.
+    """
+
+    def __init__(self, accounts=None, exchange=None, tick_key=None, request_key=None, bus=None, seconds=None):
+        self.accounts = accounts if isinstance(accounts, AccountManager) else AccountManager(accounts)
+        self.exchange = exchange if isinstance(exchange, ExchangeCore) else ExchangeCore()
+        self.tick_key = tick_key if callable(tick_key) else self._tick_time
+        self.request_key = request_key if callable(request_key) else request_time
+        self.bus = bus
+        self.seconds = seconds if callable(seconds) else to_seconds
+        self.fills = []
+
+    def _tick_time(self, tick):
+        # same unit as the trades' time, so request times must use it too
+        return self.exchange.transactor.timestamp(tick[DATE], tick[TIME])
+
+    def on_request(self, req, now=None):
+        if req.__class__ is ReqOrder and req.orderType is MARKET and req.price <= 0:
+            req = self.priced(req)
+        return self._route(req, self.accounts.on_request(req, now))
+
+    def priced(self, req):
+        """A copy of the market request ``req`` at its reference price, or ``req`` itself without one."""
+        price = self.exchange.reference_price(req.code, req.bsType, req.qty)
+        if price is None:
+            return req
+        return ReqOrder(req.accountID, req.code, req.qty, price, req.orderType, req.bsType, req.time, req.info)
+
+    def drain(self, now=None):
+        """Run the requests the account throttle queued and are due by ``now``, returning their results."""
+        return [self._route(req, result) for req, result in self.accounts.drain(now)]
+
+    def _route(self, req, result):
+        if result.__class__ is Order:
+            if req.__class__ is ReqOrder:
+                if result.unfilled > 0:
+                    if result.orderType.value in IMMEDIATE:
+                        self._execute(result)
+                    else:
+                        self.exchange.on_order(copy_order(result))
+            elif req.__class__ is CancelOrder:
+                if result.reason is CanceledReason.CLIENT:
+                    self.exchange.on_cancel(req)
+            if self.bus is not None:
+                self.bus.publish(EventType.ORDER, copy_order(result))
+        return result
+
+    def _execute(self, order):
+        on_trade = self.accounts.on_trade if self.bus is None else self.on_trade
+        for trade in self.exchange.on_order(copy_order(order)):
+            on_trade(trade)
+            self.fills.append(trade)
+        if order.unfilled > 0:
+            self.accounts.expire([order])
+
+    def take_fills(self):
+        """Return the trades of market, IOC and FOK orders collected so far and start a new list."""
+        fills = self.fills
+        self.fills = []
+        return fills
+
+    def on_trade(self, trade):
+        account = self.accounts.get(trade.accountID, None)
+        # a filling trade moves the order out of _orders, so look it up first
+        order = None if account is None else account._orders.get(trade.orderID, None)
+        if not self.accounts.on_trade(trade):
+            return False
+        if self.bus is not None:
+            publish = self.bus.publish
+            publish(EventType.TRADE, trade)
+            if order is not None:
+                publish(EventType.ORDER, copy_order(order))
+            cash = account._cash
+            publish(EventType.CASH, Cash(cash.accountID, cash.available, cash.frozen))
+            position = account._positions.get(trade.code, None)
+            if position is not None:
+                publish(EventType.POSITION, copy_position(position))
+        return True
+
+    def on_tick(self, tick):
+        on_trade = self.accounts.on_trade if self.bus is None else self.on_trade
+        for trade in self.exchange.on_tick(tick):
+            on_trade(trade)
+            yield trade
+        if self.bus is not None:
+            self.bus.flush()
+
+    def run(self, ticks, requests):
+        """Merge ticks and requests by timestamp and yield every resulting event.
+
+        Request results (orders, cancels, query answers) and trades are yielded
+        as they happen. A tick goes first when it has the same timestamp as a
+        request, so a new order only matches against later ticks. A request
+        the account throttle queues yields None, and its result is yielded
+        once it is due, before the first later tick or request; whatever is
+        still queued when both run out is run at the end.
+
+        A request whose key is None (cancels and queries have no time) runs
+        at the current position of the merge: right after the last tick or
+        request before it.
+        """
+        ticks = iter(ticks)
+        requests = iter(requests)
+        tick_key = self.tick_key
+        request_key = self.request_key
+        on_request = self.on_request
+        on_tick = self.exchange.on_tick
+        on_trade = self.accounts.on_trade
+        accounts = self.accounts
+        seconds = self.seconds if accounts.throttle is not None else None
+        commit_due = accounts.journal.commit_due if accounts.journal is not None else None
+        flush = None
+        if self.bus is not None:
+            on_trade = self.on_trade
+            flush = self.bus.flush
+
+        tick = next(ticks, None)
+        req = next(requests, None)
+        if tick is not None:
+            tick_time = tick_key(tick)
+        position = None
+        while req is not None:
+            req_time = request_key(req)
+            if req_time is None:
+                req_time = position
+            while tick is not None and req_time is not None and tick_time <= req_time:
+                if accounts.queued:
+                    yield from self._drain_due(seconds(tick_time))
+                for trade in on_tick(tick):
+                    on_trade(trade)
+                    yield trade
+                if flush is not None:
+                    flush()
+                if commit_due is not None:
+                    commit_due()
+                position = tick_time
+                tick = next(ticks, None)
+                if tick is not None:
+                    tick_time = tick_key(tick)
+            if req_time is not None:
+                position = req_time
+            now = None if seconds is None or req_time is None else seconds(req_time)
+            if accounts.queued:
+                yield from self._drain_due(now)
+            yield on_request(req, now)
+            if self.fills:
+                yield from self.take_fills()
+            req = next(requests, None)
+        while tick is not None:
+            if accounts.queued:
+                yield from self._drain_due(seconds(tick_time))
+            for trade in on_tick(tick):
+                on_trade(trade)
+                yield trade
+            if flush is not None:
+                flush()
+            if commit_due is not None:
+                commit_due()
+            tick = next(ticks, None)
+            if tick is not None:
+                tick_time = tick_key(tick)
+        if accounts.queued:
+            yield from self._drain_due(INF)
+        if self.fills:
+            yield from self.take_fills()
+        if flush is not None:
+            flush()
+
+    def _drain_due(self, now):
+        for result in self.drain(now):
+            yield result
+            if self.fills:
+                yield from self.take_fills()
+
+
+def request_time(req):
+    return getattr(req, "time", None)
+
+
+def to_seconds(value):
+    """Throttle seconds of a tick or request time: a datetime, or epoch milliseconds (see epoch_ms)."""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value / 1000
+
+
+def copy_order(order):
+    return Order(order.accountID, order.orderID, order.code, order.qty, order.cumQty, order.price,
+                 order.orderType, order.bsType, order.orderStatus, order.frzAmt, order.frzFee,
+                 order.cumAmt, order.cumFee, order.canceled, order.reason, order.time, order.cnfmTime)
+
+
+def copy_position(position):
+    return Position(position.accountID, position.code, position.origin, position.available, position.frozen,
+                    position.today, position.todaySell)
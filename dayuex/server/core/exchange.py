@@ -1,7 +1,11 @@
 from dayuex.module.storage import Trade, Order
 from dayuex.module.enums import BSType, OrderType, OrderStatus
+from dayuex.server.core.ids import BlockIDGenerator
 from datetime import datetime
-from queue import deque
+from functools import lru_cache
+from collections import deque
+from array import array
+from bisect import bisect_left, bisect_right, insort
 import logging
 import time
 
@@ -15,26 +19,114 @@ DATE = "date"
 TIME = "time"
 PRE = "pre"
 
+BUY = BSType.BUY.value
+MARKET = OrderType.MARKET.value
+FOK = OrderType.FOK.value
+# executed against the last tick of their code on arrival, never put in the book
+IMMEDIATE = frozenset([MARKET, OrderType.IOC.value, FOK])
+INF = float("inf")
+
 
 class ExchangeCore(object):
+    """Order books per code matched against incoming ticks.
+
+    Limit orders rest in the book until filled or canceled. Market, IOC and
+    FOK orders are matched against the last tick of their code as they
+    arrive and never enter the book: ``on_order`` returns their trades, and
+    whatever did not fill (``unfilled``) is left for the caller to cancel.
+    With a SharedTransactor they only get the depth of that tick the resting
+    orders left.
+    """
 
     def __init__(self, packs=None, transactor=None):
         self._packs = packs if isinstance(packs, dict) else {}
         self.transactor = transactor if isinstance(transactor, Transactor) else Transactor()
+        self._index = {}
+        self._last = {}
 
     def on_tick(self, tick):
         code = tick[CODE]
+        self._last[code] = tick
         pack = self._get_pack(code)
-        for order in pack:
+        index = self._index
+        self.transactor.prepare(tick)
+        for order in pack.crossing(tick):
             yield from self.transactor[order.bsType](order, tick)
-            pack.wait(order)
-        pack.recycle()
+            if order.unfilled <= 0:
+                index.pop(order.orderID, None)
 
     def on_order(self, order):
+        if order.orderType.value in IMMEDIATE:
+            return self.execute(order)
+        self._index[order.orderID] = (order.code, order)
         self._get_pack(order.code).put(order)
 
+    def execute(self, order):
+        """Fill ``order`` as far as the last tick of its code allows and return the trades.
+
+        A market order takes any price up to its own, its collar, when that
+        is set (above 0); a market buy spends at most its ``frzAmt``. A FOK
+        order fills completely or not at all.
+        """
+        tick = self._last.get(order.code, None)
+        if tick is None:
+            return []
+        buy = order.bsType.value == BUY
+        market = order.orderType.value == MARKET
+        if market and order.price <= 0:
+            limit = INF if buy else -INF
+        else:
+            limit = order.price
+        budget = order.frzAmt if buy and market else None
+        wanted = order.unfilled
+        fillable = 0
+        for price, volume in self.transactor.levels(order.bsType, tick):
+            if (limit < price) if buy else (limit > price):
+                break
+            if budget is not None:
+                volume = min(volume, budget // price)
+                budget -= volume * price
+            fillable += volume
+            if fillable >= wanted:
+                break
+        if fillable < wanted and order.orderType.value == FOK:
+            return []
+        # the order's own qty and price are left as they are
+        return list(self.transactor.take(order, tick, limit, min(wanted, fillable)))
+
+    def reference_price(self, code, bsType, qty):
+        """The worst price a market order of ``qty`` would reach on the last tick of ``code``.
+
+        That is the price of the level that completes ``qty``, or of the last
+        level when the tick has less; None without a tick or depth.
+        """
+        tick = self._last.get(code, None)
+        if tick is None:
+            return None
+        price = None
+        for price, volume in self.transactor.levels(bsType, tick):
+            qty -= volume
+            if qty <= 0:
+                break
+        return price
+
     def on_cancel(self, cancel):
-        self._get_pack(cancel.code).cancel(cancel)
+        try:
+            code, order = self._index.pop(cancel.orderID)
+        except KeyError:
+            logging.error("cancel order | %s | order not found", cancel)
+            return None
+        self._packs[code].cancel(order)
+        return order
+
+    def clear(self):
+        """Drop every resting order, e.g. at the close, and return how many there were."""
+        count = len(self._index)
+        self._index = {}
+        self._packs = {}
+        self._last = {}
+        self.transactor.clear()
+        return count
 
     def _get_pack(self, code):
         try:
@@ -45,86 +137,381 @@ class ExchangeCore(object):
             return pack
 
 
+class PriceLevels(object):
+    """One side of an order book: FIFO queues of orders keyed by price.
+
+    Levels are kept sorted by ``key = side * price`` so the most aggressive
+    price always comes first: ``side=-1`` for buys (highest price first) and
+    ``side=1`` for sells (lowest price first).
+    """
+
+    def __init__(self, side):
+        self.side = side
+        self._keys = []
+        self._levels = {}
+
+    def __len__(self):
+        return sum(map(len, self._levels.values()))
+
+    def __iter__(self):
+        for key in self._keys:
+            yield from self._levels[key]
+
+    def put(self, order):
+        key = self.side * order.price
+        try:
+            self._levels[key].append(order)
+        except KeyError:
+            insort(self._keys, key)
+            self._levels[key] = deque([order])
+
+    def compact(self, keys, dead):
+        for key in keys:
+            level = self._levels.get(key, None)
+            if level is None:
+                continue
+            alive = [order for order in level if order.orderID not in dead]
+            if alive:
+                self._levels[key] = deque(alive)
+            else:
+                self._drop(key)
+
+    def crossing(self, limit, dead):
+        """Yield resting orders whose key is <= limit, in price-time priority.
+
+        Orders whose orderID is in ``dead`` are dropped without being yielded.
+        Each yielded order is re-queued in place unless it has nothing left
+        unfilled once the consumer resumes the generator.
+        """
+        keys = self._keys
+        end = bisect_right(keys, limit)
+        if not end:
+            return
+        levels = self._levels
+        for key in keys[:end]:
+            level = levels[key]
+            size = len(level)
+            for i in range(size):
+                order = level.popleft()
+                if order.orderID in dead:
+                    dead.discard(order.orderID)
+                    continue
+                try:
+                    yield order
+                except GeneratorExit:
+                    # put the level back in its original FIFO order before leaving
+                    front = size - i - 1
+                    if order.unfilled > 0:
+                        level.appendleft(order)
+                        front += 1
+                    level.rotate(len(level) - front)
+                    if not level:
+                        self._drop(key)
+                    raise
+                if order.unfilled > 0:
+                    level.append(order)
+            if not level:
+                self._drop(key)
+
+    def _drop(self, key):
+        del self._levels[key]
+        del self._keys[bisect_left(self._keys, key)]
+
+
 class OrderPack(object):
 
+    COMPACT = 1024
+
     def __init__(self, code):
         self.code = code
-        self._orders = deque()
-        self._wait = deque()
-
-    def __iter__(self):
-        while self._orders.__len__():
-            yield self._orders.popleft()
+        self._dead = set()
+        self._stale = set()
+        self._buy = PriceLevels(-1)
+        self._sell = PriceLevels(1)
+        self._sides = {BSType.BUY.value: self._buy,
+                       BSType.SELL.value: self._sell}
 
-    def recycle(self):
-        while self._wait.__len__():
-            order = self._wait.pop()
-            self._orders.appendleft(order)
+    def __len__(self):
+        return len(self._buy) + len(self._sell) - len(self._dead)
 
-    def wait(self, order):
-        if order.unfilled > 0:
-            self._wait.append(order)
+    def __iter__(self):
+        dead = self._dead
+        for side in (self._buy, self._sell):
+            for order in side:
+                if order.orderID not in dead:
+                    yield order
+
+    def crossing(self, tick):
+        """Yield only the orders which can trade against the tick's best quotes."""
+        ask = tick[ASK]
+        if len(ask):
+            yield from self._buy.crossing(-ask[0][0], self._dead)
+        bid = tick[BID]
+        if len(bid):
+            yield from self._sell.crossing(bid[0][0], self._dead)
 
     def put(self, order):
-        self._orders.append(order)
+        self._sides[order.bsType.value].put(order)
 
     def cancel(self, order):
-        try:
-            self._orders.remove(order)
-        except:
-            try:
-                self._wait.remove(order)
-            except:
-                logging.error("cancel order | %s | fail", order)
+        # tombstone only: the order is dropped the next time a tick reaches its level
+        side = self._sides[order.bsType.value]
+        self._dead.add(order.orderID)
+        self._stale.add((side, side.side * order.price))
+        if len(self._dead) >= self.COMPACT:
+            self.compact()
+
+    def compact(self):
+        for side in (self._buy, self._sell):
+            side.compact([key for s, key in self._stale if s is side], self._dead)
+        self._dead.clear()
+        self._stale.clear()
 
 
 class Transactor(object):
 
-    def __init__(self, ids=None):
-        self.ids = ids if hasattr(ids, "next") else TimerIDGenerator.year()
+    def __init__(self, ids=None, timestamp=None):
+        self.ids = ids if hasattr(ids, "next") else BlockIDGenerator.year()
+        self.timestamp = timestamp if callable(timestamp) else cached(combine)
         self.funcs = {BSType.BUY.value: self.buy,
                       BSType.SELL.value: self.sell}
+        self._tick = None
+        self._time = None
 
     def __getitem__(self, item):
         return self.funcs[item.value]
 
+    def prepare(self, tick):
+        self._tick = tick
+        self._time = None
+
+    def fill_time(self):
+        # every fill of one tick shares its timestamp, computed on the first fill only
+        time = self._time
+        if time is None:
+            tick = self._tick
+            time = self._time = self.timestamp(tick[DATE], tick[TIME])
+        return time
+
+    def clear(self):
+        self._tick = None
+        self._time = None
+
+    def levels(self, bsType, tick):
+        """The [price, volume] levels an order of ``bsType`` would match against, best first."""
+        if tick is not self._tick:
+            self.prepare(tick)
+        return tick[ASK] if bsType.value == BUY else tick[BID]
+
+    def take(self, order, tick, limit, qty):
+        """Fill at most ``qty`` of ``order`` at prices up to (buy) or down to (sell) ``limit``.
+
+        Used for market, IOC and FOK orders: the order's qty and price are
+        not used, so they are left as the account sent them.
+        """
+        if tick is not self._tick:
+            self.prepare(tick)
+        buy = order.bsType.value == BUY
+        for price, volume in tick[ASK] if buy else tick[BID]:
+            if qty <= 0 or ((limit < price) if buy else (limit > price)):
+                return
+            fill = volume if volume < qty else qty
+            qty -= fill
+            order.cumQty += fill
+            yield Trade(
+                order.accountID, order.orderID, self.ids.next(), order.code, fill, price,
+                order.orderType, order.bsType, 0, OrderStatus.FILLED.value, self.fill_time()
+            )
+
     def buy(self, order, tick):
+        if tick is not self._tick:
+            self.prepare(tick)
         for price, volume in tick[ASK]:
             if order.price >= price and (order.unfilled > 0):
                 if order.unfilled <= volume:
-                    order.cumQty = order.qty
+                    qty = order.unfilled
+                    order.cumQty += qty
                     yield Trade(
-                        order.accountID, order.orderID, self.ids.next(), order.code, order.unfilled, price,
-                        order.orderType, order.bsType, 0, OrderStatus.FILLED.value, combine(tick[DATE], tick[TIME])
+                        order.accountID, order.orderID, self.ids.next(), order.code, qty, price,
+                        order.orderType, order.bsType, 0, OrderStatus.FILLED.value, self.fill_time()
                     )
                 else:
                     order.cumQty += volume
                     yield Trade(
                         order.accountID, order.orderID, self.ids.next(), order.code, volume, price,
-                        order.orderType, order.bsType, 0, OrderStatus.FILLED.value, combine(tick[DATE], tick[TIME])
+                        order.orderType, order.bsType, 0, OrderStatus.FILLED.value, self.fill_time()
                     )
             else:
                 return
 
     def sell(self, order, tick):
+        if tick is not self._tick:
+            self.prepare(tick)
         for price, volume in tick[BID]:
             if order.price <= price and (order.unfilled > 0):
                 if order.unfilled <= volume:
-                    order.cumQty = order.qty
+                    qty = order.unfilled
+                    order.cumQty += qty
                     yield Trade(
-                        order.accountID, order.orderID, self.ids.next(), order.code, order.unfilled, price,
-                        order.orderType, order.bsType, 0, OrderStatus.FILLED.value, combine(tick[DATE], tick[TIME])
+                        order.accountID, order.orderID, self.ids.next(), order.code, qty, price,
+                        order.orderType, order.bsType, 0, OrderStatus.FILLED.value, self.fill_time()
                     )
                 else:
                     order.cumQty += volume
                     yield Trade(
                         order.accountID, order.orderID, self.ids.next(), order.code, volume, price,
-                        order.orderType, order.bsType, 0, OrderStatus.FILLED.value, combine(tick[DATE], tick[TIME])
+                        order.orderType, order.bsType, 0, OrderStatus.FILLED.value, self.fill_time()
                     )
             else:
                 return
 
 
+class SharedTransactor(Transactor):
+    """Matches orders against a tick whose depth is consumed as it fills.
+
+    Every order matched against the same tick draws from one pool of
+    remaining volume per level, so the order book's price-time priority
+    decides who gets the liquidity. ``prepare`` must be called once per tick
+    (``ExchangeCore.on_tick`` does); calling buy/sell with a new tick object
+    prepares it implicitly.
+
+    The pool of the last tick of every code is kept, so an order matched
+    against that tick later, after ticks of other codes, gets what is left
+    of it rather than its full depth again.
+    """
+
+    def __init__(self, ids=None, timestamp=None):
+        super(SharedTransactor, self).__init__(ids, timestamp)
+        self._ask = array("q")
+        self._bid = array("q")
+        self._ask_at = 0
+        self._bid_at = 0
+        # code -> the pool of its last tick, saved when another tick becomes current
+        self._pools = {}
+
+    def prepare(self, tick):
+        self._park()
+        super(SharedTransactor, self).prepare(tick)
+        self._ask = array("q", [volume for price, volume in tick[ASK]])
+        self._bid = array("q", [volume for price, volume in tick[BID]])
+        self._ask_at = 0
+        self._bid_at = 0
+
+    def _park(self):
+        if self._tick is not None:
+            self._pools[self._tick[CODE]] = (self._tick, self._time, self._ask, self._bid,
+                                             self._ask_at, self._bid_at)
+
+    def _resume(self, tick):
+        pool = self._pools.get(tick[CODE], None)
+        if pool is not None and pool[0] is tick:
+            self._park()
+            self._tick, self._time, self._ask, self._bid, self._ask_at, self._bid_at = pool
+        else:
+            self.prepare(tick)
+
+    def clear(self):
+        super(SharedTransactor, self).clear()
+        self._pools = {}
+
+    def levels(self, bsType, tick):
+        if tick is not self._tick:
+            self._resume(tick)
+        if bsType.value == BUY:
+            levels, remain, i = tick[ASK], self._ask, self._ask_at
+        else:
+            levels, remain, i = tick[BID], self._bid, self._bid_at
+        return [(levels[j][0], remain[j]) for j in range(i, len(remain))]
+
+    def take(self, order, tick, limit, qty):
+        if tick is not self._tick:
+            self._resume(tick)
+        buy = order.bsType.value == BUY
+        if buy:
+            levels, remain, i, at = tick[ASK], self._ask, self._ask_at, "_ask_at"
+        else:
+            levels, remain, i, at = tick[BID], self._bid, self._bid_at, "_bid_at"
+        n = len(remain)
+        while i < n and qty > 0:
+            price = levels[i][0]
+            if (limit < price) if buy else (limit > price):
+                break
+            volume = remain[i]
+            fill = volume if volume < qty else qty
+            remain[i] = volume - fill
+            if fill == volume:
+                i += 1
+                setattr(self, at, i)
+            if fill <= 0:
+                continue
+            qty -= fill
+            order.cumQty += fill
+            yield Trade(
+                order.accountID, order.orderID, self.ids.next(), order.code, fill, price,
+                order.orderType, order.bsType, 0, OrderStatus.FILLED.value, self.fill_time()
+            )
+
+    def buy(self, order, tick):
+        if tick is not self._tick:
+            self._resume(tick)
+        levels = tick[ASK]
+        remain = self._ask
+        i = self._ask_at
+        n = len(remain)
+        while i < n and order.unfilled > 0:
+            price = levels[i][0]
+            if order.price < price:
+                break
+            volume = remain[i]
+            if volume <= 0:
+                i += 1
+                self._ask_at = i
+                continue
+            if order.unfilled < volume:
+                qty = order.unfilled
+                remain[i] = volume - qty
+            else:
+                qty = volume
+                remain[i] = 0
+                i += 1
+                self._ask_at = i
+            order.cumQty += qty
+            yield Trade(
+                order.accountID, order.orderID, self.ids.next(), order.code, qty, price,
+                order.orderType, order.bsType, 0, OrderStatus.FILLED.value, self.fill_time()
+            )
+
+    def sell(self, order, tick):
+        if tick is not self._tick:
+            self._resume(tick)
+        levels = tick[BID]
+        remain = self._bid
+        i = self._bid_at
+        n = len(remain)
+        while i < n and order.unfilled > 0:
+            price = levels[i][0]
+            if order.price > price:
+                break
+            volume = remain[i]
+            if volume <= 0:
+                i += 1
+                self._bid_at = i
+                continue
+            if order.unfilled < volume:
+                qty = order.unfilled
+                remain[i] = volume - qty
+            else:
+                qty = volume
+                remain[i] = 0
+                i += 1
+                self._bid_at = i
+            order.cumQty += qty
+            yield Trade(
+                order.accountID, order.orderID, self.ids.next(), order.code, qty, price,
+                order.orderType, order.bsType, 0, OrderStatus.FILLED.value, self.fill_time()
+            )
+
+
 def combine(date, time):
     day = date % 100
     month = int((date - day) % 10000 / 100)
@@ -138,6 +525,30 @@ def combine(date, time):
     return datetime(year, month, day, hour, minute, second, ms*1000)
 
 
+def epoch_ms(date, time):
+    """Integer milliseconds since 1970-01-01 for a yyyymmdd date and HHMMSSmmm time.
+
+    Use it as ``Transactor(timestamp=epoch_ms)`` to skip datetime creation.
+    """
+    year, date = divmod(date, 10000)
+    month, day = divmod(date, 100)
+    time, ms = divmod(time, 1000)
+    time, second = divmod(time, 100)
+    hour, minute = divmod(time, 100)
+    # days from civil date, proleptic gregorian calendar
+    year -= month <= 2
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    days = era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+    return (((days * 24 + hour) * 60 + minute) * 60 + second) * 1000 + ms
+
+
+def cached(timestamp, maxsize=4096):
+    """Bounded LRU cache over a (date, time) -> timestamp conversion."""
+    return lru_cache(maxsize)(timestamp)
+
+
 class TimerIDGenerator(object):
 
     def __init__(self, timestamp, multiple=100):
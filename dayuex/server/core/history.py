@@ -0,0 +1,262 @@
+"""Append-only columnar history of an account's trades and completed orders.
+
+Each field is an ``array`` column, codes are interned into a small table and
+times are stored as dayuex.module.codec time kind + int64 value. Rows are
+rebuilt into Trade/Order objects only when queried. Prices and traded
+amounts are float64 columns so a float price reads back as the trade applied
+it (an integral value reads back as int); other int fields take an integral
+float and raise on a fractional one, like the codec.
+
+With a ``limit`` the oldest rows are dropped once twice that many are
+stored, so between ``limit`` and ``2 * limit`` of the latest rows are kept.
+"""
+from dayuex.module.storage import Order, Trade
+from dayuex.module.enums import OrderType, BSType, OrderStatus, CanceledReason
+from dayuex.module.codec import pack_time, unpack_time, enum_value, as_int, NO_TIME, RAW_TIME
+from array import array
+from bisect import bisect_left
+
+
+def members(enum):
+    return {member.value: member for member in enum}
+
+
+ORDER_TYPES = members(OrderType)
+BS_TYPES = members(BSType)
+ORDER_STATUSES = members(OrderStatus)
+REASONS = members(CanceledReason)
+
+
+class History(object):
+
+    INTS = []
+    FLOATS = []
+    ENUMS = []
+
+    def __init__(self, accountID=0, limit=None):
+        self.accountID = accountID
+        self.limit = limit
+        self.codes = []
+        self._code_index = {}
+        self._code = array("i")
+        self._time_kind = array("b")
+        self._time = array("q")
+        self._ints = [array("q") for name in self.INTS]
+        self._floats = [array("d") for name in self.FLOATS]
+        self._enums = [array("b") for name, values in self.ENUMS]
+        self._by_code = {}
+        # whether _time is non decreasing, so time ranges can bisect
+        self._ordered = True
+        self.append = self._bind()
+
+    def __len__(self):
+        return len(self._time)
+
+    def _bind(self):
+        """Generate this class's append, bound to the columns of ``self``.
+
+        Like the dayuex.module.codec pack functions, the source is generated
+        once per class so every column append is a pre-bound local call.
+        """
+        cls = self.__class__
+        make = cls.__dict__.get("_make_append", None)
+        if make is None:
+            lines = ["def make(self):",
+                     "    code_index = self._code_index",
+                     "    times = self._time"]
+            body = []
+            for i, name in enumerate(self.INTS):
+                lines.append("    i{0} = self._ints[{0}].append".format(i))
+                body.append("            i{}(obj.{})".format(i, name))
+            for i, name in enumerate(self.FLOATS):
+                lines.append("    f{0} = self._floats[{0}].append".format(i))
+                body.append("            f{}(obj.{})".format(i, name))
+            for i, (name, values) in enumerate(self.ENUMS):
+                lines.append("    e{0} = self._enums[{0}].append".format(i))
+                # the transactors set orderStatus as a plain int
+                body += ["            v = obj.{}".format(name),
+                         "            e{}(v if v.__class__ is int else v._value_)".format(i)]
+            lines += [
+                "    code_append = self._code.append",
+                "    kind_append = self._time_kind.append",
+                "    time_append = times.append",
+                "    index = self._index",
+                "",
+                "    def append(obj):",
+                "        row = len(times)",
+                "        code = obj.code",
+                "        try:",
+                "            c = code_index[code]",
+                "        except KeyError:",
+                "            c = self._add_code(code)",
+                "        time = obj.time",
+                "        if time is None:",
+                "            kind = NO_TIME",
+                "            value = 0",
+                "        elif time.__class__ is int:",
+                "            kind = RAW_TIME",
+                "            value = time",
+                "        else:",
+                "            kind, value = pack_time(time)",
+                "        try:",
+            ] + body + [
+                "        except (TypeError, AttributeError):",
+                "            self._append_coerced(obj, row)",
+                "        if row and value < times[-1]:",
+                "            self._ordered = False",
+                "        code_append(c)",
+                "        kind_append(kind)",
+                "        time_append(value)",
+                "        self._by_code[code].append(row)",
+                "        index(obj, row)",
+                "        limit = self.limit",
+                "        if limit is not None and row + 1 >= 2 * limit:",
+                "            self._trim(row + 1 - limit)",
+                "            row = len(times) - 1",
+                "        return row",
+                "",
+                "    return append",
+            ]
+            namespace = {"pack_time": pack_time, "NO_TIME": NO_TIME, "RAW_TIME": RAW_TIME}
+            exec("\n".join(lines), namespace)
+            make = cls._make_append = namespace["make"]
+        return make(self)
+
+    def _add_code(self, code):
+        index = self._code_index[code] = len(self.codes)
+        self.codes.append(code)
+        self._by_code[code] = array("l")
+        return index
+
+    def _append_coerced(self, obj, row):
+        # drop what the failed append wrote, then store integral floats as ints and enums by enum_value;
+        # all values are converted first, so a fractional int raises before any column grows
+        for column in self._ints + self._floats + self._enums:
+            del column[row:]
+        ints = [as_int(getattr(obj, name)) for name in self.INTS]
+        floats = [float(getattr(obj, name)) for name in self.FLOATS]
+        enums = [enum_value(getattr(obj, name)) for name, values in self.ENUMS]
+        for column, value in zip(self._ints, ints):
+            column.append(value)
+        for column, value in zip(self._floats, floats):
+            column.append(value)
+        for column, value in zip(self._enums, enums):
+            column.append(value)
+
+    def _trim(self, count):
+        for column in [self._code, self._time_kind, self._time] + self._ints + self._floats + self._enums:
+            del column[:count]
+        self._by_code = {code: array("l") for code in self.codes}
+        for row, index in enumerate(self._code):
+            self._by_code[self.codes[index]].append(row)
+        self._reindex()
+
+    def _index(self, obj, row):
+        pass
+
+    def _reindex(self):
+        pass
+
+    def row(self, i):
+        obj = self.cls.__new__(self.cls)
+        for name in self.cls.__slots__:
+            setattr(obj, name, None)
+        obj.accountID = self.accountID
+        obj.code = self.codes[self._code[i]]
+        obj.time = unpack_time(self._time_kind[i], self._time[i])
+        for name, column in zip(self.INTS, self._ints):
+            setattr(obj, name, column[i])
+        for name, column in zip(self.FLOATS, self._floats):
+            value = column[i]
+            setattr(obj, name, int(value) if value.is_integer() else value)
+        for (name, values), column in zip(self.ENUMS, self._enums):
+            setattr(obj, name, values.get(column[i], None))
+        return obj
+
+    def rows(self, indexes):
+        row = self.row
+        return [row(i) for i in indexes]
+
+    def by_code(self, code):
+        return self.rows(self._by_code.get(code, ()))
+
+    def between(self, start=None, end=None, code=None):
+        """Rows with start <= time < end, optionally of one code, in insertion order.
+
+        ``start`` and ``end`` are datetimes or raw integer times like the
+        stored ones; None leaves that side open.
+        """
+        times = self._time
+        low = None if start is None else pack_time(start)[1]
+        high = None if end is None else pack_time(end)[1]
+        if self._ordered:
+            first = 0 if low is None else bisect_left(times, low)
+            last = len(times) if high is None else bisect_left(times, high)
+            indexes = range(first, last)
+        else:
+            indexes = [i for i, value in enumerate(times)
+                       if (low is None or value >= low) and (high is None or value < high)]
+        if code is not None:
+            index = self._code_index.get(code, None)
+            codes = self._code
+            indexes = [i for i in indexes if codes[i] == index]
+        return self.rows(indexes)
+
+
+class TradeHistory(History):
+    """Trades by orderID (``history[orderID]`` is the list of its trades), code or time."""
+
+    cls = Trade
+    INTS = ["orderID", "tradeID", "qty", "fee"]
+    FLOATS = ["price"]
+    ENUMS = [("orderType", ORDER_TYPES), ("bsType", BS_TYPES), ("orderStatus", ORDER_STATUSES)]
+
+    def __init__(self, accountID=0, limit=None):
+        super(TradeHistory, self).__init__(accountID, limit)
+        self._by_order = {}
+
+    def _index(self, trade, row):
+        try:
+            self._by_order[trade.orderID].append(row)
+        except KeyError:
+            self._by_order[trade.orderID] = array("l", [row])
+
+    def _reindex(self):
+        self._by_order = {}
+        for row, orderID in enumerate(self._ints[0]):
+            try:
+                self._by_order[orderID].append(row)
+            except KeyError:
+                self._by_order[orderID] = array("l", [row])
+
+    def __contains__(self, orderID):
+        return orderID in self._by_order
+
+    def __getitem__(self, orderID):
+        return self.rows(self._by_order[orderID])
+
+
+class OrderHistory(History):
+    """Completed orders by orderID (``history[orderID]``), code or time."""
+
+    cls = Order
+    INTS = ["orderID", "qty", "cumQty", "frzAmt", "frzFee", "cumFee", "canceled"]
+    FLOATS = ["price", "cumAmt"]
+    ENUMS = [("orderType", ORDER_TYPES), ("bsType", BS_TYPES), ("orderStatus", ORDER_STATUSES),
+             ("reason", REASONS)]
+
+    def __init__(self, accountID=0, limit=None):
+        super(OrderHistory, self).__init__(accountID, limit)
+        self._by_id = {}
+
+    def _index(self, order, row):
+        self._by_id[order.orderID] = row
+
+    def _reindex(self):
+        self._by_id = {orderID: row for row, orderID in enumerate(self._ints[0])}
+
+    def __contains__(self, orderID):
+        return orderID in self._by_id
+
+    def __getitem__(self, orderID):
+        return self.row(self._by_id[orderID])
@@ -0,0 +1,62 @@
+import time
+
+
+class BlockIDGenerator(object):
+    """Monotonic ID generator which reads the clock once per block of IDs.
+
+    IDs are ``head + n`` where n restarts from the scaled clock
+    (``clock() * multiple - origin``) whenever a block of ``block`` IDs is used
+    up, and never goes backwards. With ``clock=None`` n is a plain counter
+    from ``origin``, which keeps IDs reproducible between backtest runs.
+    """
+
+    def __init__(self, origin=0, multiple=100, block=1024, clock=time.time, head=0):
+        self.origin = origin
+        self.multiple = multiple
+        self.block = block
+        self.clock = clock
+        self.head = head
+        self.last = 0 if clock else origin
+        self.limit = self.last
+
+    @classmethod
+    def year(cls, multiple=100, **kwargs):
+        from datetime import date
+
+        origin = time.mktime(date.today().replace(month=1, day=1).timetuple())
+        return cls(int(origin * multiple), multiple, **kwargs)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next()
+
+    def next(self):
+        if self.last < self.limit:
+            self.last += 1
+            return self.head + self.last
+        return self.head + self._seed(self.block)
+
+    def reserve(self, count):
+        """Reserve ``count`` consecutive IDs at once and return them as a range."""
+        start = self.head + self._seed(count)
+        self.last = self.limit
+        return range(start, start + count)
+
+    def skip(self, value):
+        """Make sure later IDs are above ``value``, e.g. after replaying old ones."""
+        value -= self.head
+        if value > self.last:
+            self.last = value
+            self.limit = value
+
+    def _seed(self, count):
+        last = self.last + 1
+        if self.clock is not None:
+            now = int(self.clock() * self.multiple) - self.origin
+            if now > last:
+                last = now
+        self.last = last
+        self.limit = last + count - 1
+        return last
@@ -0,0 +1,239 @@
+"""Cash and positions of many accounts held in contiguous int64 columns.
+
+``PositionLedger`` interns every (accountID, code) into a slot and keeps
+origin, available, frozen, today and todaySell as ``array("q")`` columns;
+``CashLedger`` does the same per accountID for available and frozen. The
+slot methods follow storage.Position / storage.Cash, errors included, and
+``PositionView`` / ``CashView`` expose one slot as a Position / Cash, so an
+Account can run on ``ledger.positions(accountID)`` and ``ledger.cash(accountID)``.
+"""
+from dayuex.module.storage import Cash, Position, PositionFreezeExceed, PositionSubExceed, \
+    CashFreezeExceed, CashUnfreezeExceed, CashSubExceed
+from collections.abc import Mapping
+from array import array
+import numpy as np
+
+
+def column(name):
+
+    def get(self):
+        return getattr(self._ledger, name)[self._slot]
+
+    def set(self, value):
+        getattr(self._ledger, name)[self._slot] = value
+
+    return property(get, set)
+
+
+class PositionView(Position):
+
+    __slots__ = ["_ledger", "_slot"]
+
+    def __init__(self, ledger, slot):
+        self._ledger = ledger
+        self._slot = slot
+        self.accountID = ledger.accountIDs[slot]
+        self.code = ledger.codes[ledger.code_index[slot]]
+
+    origin = column("origin")
+    available = column("available")
+    frozen = column("frozen")
+    today = column("today")
+    todaySell = column("todaySell")
+
+    def __str__(self):
+        return str(Position(self.accountID, self.code, self.origin, self.available, self.frozen, self.today,
+                            self.todaySell))
+
+
+class CashView(Cash):
+
+    __slots__ = ["_ledger", "_slot"]
+
+    def __init__(self, ledger, slot):
+        self._ledger = ledger
+        self._slot = slot
+        self.accountID = ledger.accountIDs[slot]
+
+    available = column("available")
+    frozen = column("frozen")
+
+    def __str__(self):
+        return str(Cash(self.accountID, self.available, self.frozen))
+
+
+class AccountPositions(Mapping):
+    """The positions of one account in a PositionLedger, as an Account._positions dict."""
+
+    def __init__(self, ledger, accountID):
+        self.ledger = ledger
+        self.accountID = accountID
+        self._slots = ledger._slots.setdefault(accountID, {})
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __iter__(self):
+        return iter(self._slots)
+
+    def __contains__(self, code):
+        return code in self._slots
+
+    def __getitem__(self, code):
+        return PositionView(self.ledger, self._slots[code])
+
+    def __setitem__(self, code, position):
+        self.ledger.put(position, self.accountID, code)
+
+
+class PositionLedger(object):
+
+    FIELDS = ["origin", "available", "frozen", "today", "todaySell"]
+
+    def __init__(self):
+        self.codes = []
+        self._code_index = {}
+        self._slots = {}
+        self.accountIDs = array("q")
+        self.code_index = array("i")
+        self.origin = array("q")
+        self.available = array("q")
+        self.frozen = array("q")
+        self.today = array("q")
+        self.todaySell = array("q")
+
+    def __len__(self):
+        return len(self.accountIDs)
+
+    def slot(self, accountID, code):
+        """The slot of (accountID, code), allocated empty on first use."""
+        slots = self._slots.setdefault(accountID, {})
+        try:
+            return slots[code]
+        except KeyError:
+            pass
+        try:
+            index = self._code_index[code]
+        except KeyError:
+            index = self._code_index[code] = len(self.codes)
+            self.codes.append(code)
+        slot = slots[code] = len(self.accountIDs)
+        self.accountIDs.append(accountID)
+        self.code_index.append(index)
+        for name in self.FIELDS:
+            getattr(self, name).append(0)
+        return slot
+
+    def put(self, position, accountID=None, code=None):
+        slot = self.slot(position.accountID if accountID is None else accountID,
+                         position.code if code is None else code)
+        for name in self.FIELDS:
+            getattr(self, name)[slot] = getattr(position, name)
+        return slot
+
+    def get(self, accountID, code):
+        slot = self._slots.get(accountID, {}).get(code, None)
+        return None if slot is None else PositionView(self, slot)
+
+    def positions(self, accountID):
+        return AccountPositions(self, accountID)
+
+    def _raise(self, error, slot, value, qty):
+        raise error(self.accountIDs[slot], self.codes[self.code_index[slot]], value, qty)
+
+    def freeze(self, slot, qty):
+        available = self.available[slot]
+        if available >= qty:
+            self.available[slot] = available - qty
+            self.frozen[slot] += qty
+        else:
+            self._raise(PositionFreezeExceed, slot, available, qty)
+
+    def unfreeze(self, slot, qty):
+        frozen = self.frozen[slot]
+        if frozen >= qty:
+            self.available[slot] += qty
+            self.frozen[slot] = frozen - qty
+        else:
+            self._raise(PositionFreezeExceed, slot, frozen, qty)
+
+    def add(self, slot, qty):
+        self.today[slot] += qty
+
+    def sub(self, slot, qty):
+        frozen = self.frozen[slot]
+        if frozen >= qty:
+            self.frozen[slot] = frozen - qty
+            self.todaySell[slot] += qty
+        else:
+            self._raise(PositionSubExceed, slot, frozen, qty)
+
+    def day_off(self):
+        """Position.day_off for every slot at once."""
+        if not len(self):
+            return
+        origin, available, frozen, today, sold = [np.frombuffer(getattr(self, name), np.int64)
+                                                  for name in self.FIELDS]
+        available += frozen
+        available += today
+        frozen[:] = 0
+        today[:] = 0
+        sold[:] = 0
+        origin[:] = available
+
+
+class CashLedger(object):
+
+    def __init__(self):
+        self._slots = {}
+        self.accountIDs = array("q")
+        self.available = array("q")
+        self.frozen = array("q")
+
+    def __len__(self):
+        return len(self.accountIDs)
+
+    def slot(self, accountID):
+        try:
+            return self._slots[accountID]
+        except KeyError:
+            slot = self._slots[accountID] = len(self.accountIDs)
+            self.accountIDs.append(accountID)
+            self.available.append(0)
+            self.frozen.append(0)
+            return slot
+
+    def put(self, cash):
+        slot = self.slot(cash.accountID)
+        self.available[slot] = cash.available
+        self.frozen[slot] = cash.frozen
+        return slot
+
+    def cash(self, accountID):
+        return CashView(self, self.slot(accountID))
+
+    def freeze(self, slot, num):
+        available = self.available[slot]
+        if available >= num:
+            self.available[slot] = available - num
+            self.frozen[slot] += num
+        else:
+            raise CashFreezeExceed(self.accountIDs[slot], available, num)
+
+    def unfreeze(self, slot, num):
+        frozen = self.frozen[slot]
+        if frozen >= num:
+            self.available[slot] += num
+            self.frozen[slot] = frozen - num
+        else:
+            raise CashUnfreezeExceed(self.accountIDs[slot], frozen, num)
+
+    def add(self, slot, num):
+        self.available[slot] += num
+
+    def sub(self, slot, num):
+        frozen = self.frozen[slot]
+        if frozen >= num:
+            self.frozen[slot] = frozen - num
+        else:
+            raise CashSubExceed(self.accountIDs[slot], self.available[slot], frozen, num)
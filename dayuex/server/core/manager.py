@@ -0,0 +1,258 @@
+from dayuex.module.request import ReqOrder, CancelOrder, QryOrder, QryTrade, QryCash, QryPosition, Snapshot
+from dayuex.module.storage import Order
+from dayuex.module.enums import CanceledReason, OrderStatus
+from heapq import heappush, heappop
+import logging
+
+
+HANDLERS = {
+    ReqOrder: "on_req_order",
+    CancelOrder: "on_cancel",
+    QryOrder: "on_qry_order",
+    QryTrade: "on_qry_trade",
+    QryCash: "on_qry_cash",
+    QryPosition: "on_qry_position",
+    Snapshot: "on_snapshot",
+}
+
+THROTTLED = (ReqOrder, CancelOrder)
+
+
+class AccountManager(object):
+    """Owns many Account instances and routes requests and trades by accountID.
+
+    With a ``journal`` (see dayuex.server._io.journal) every added account and
+    every accepted order, client cancel, applied trade and expired order is
+    recorded.
+
+    With a ``throttle`` (see dayuex.server.core.throttle) orders and cancels
+    over an account's rate are rejected with CanceledReason.THROTTLE, or
+    queued when the throttle allows a delay: the request then returns None
+    and runs from ``drain`` once it is due. Requests are timed on the
+    throttle's clock, or on the ``now`` passed in (seconds, e.g. the
+    simulated time of the request).
+    """
+
+    def __init__(self, accounts=None, journal=None, throttle=None):
+        self._accounts = {}
+        self.journal = journal
+        self.throttle = throttle
+        self._queued = []
+        self._queued_count = 0
+        if isinstance(accounts, dict):
+            accounts = accounts.values()
+        if accounts:
+            for account in accounts:
+                self.add(account)
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def __iter__(self):
+        return iter(self._accounts.values())
+
+    def __contains__(self, accountID):
+        return accountID in self._accounts
+
+    def __getitem__(self, accountID):
+        return self._accounts[accountID]
+
+    def get(self, accountID, default=None):
+        return self._accounts.get(accountID, default)
+
+    def add(self, account):
+        self._accounts[account.accountID] = account
+        if self.journal is not None:
+            account.journal = self.journal
+            self.journal.open(account)
+        return account
+
+    def on_request(self, req, now=None):
+        if self.throttle is not None and req.__class__ in THROTTLED:
+            if now is None:
+                now = self.throttle.clock()
+            wait = self.throttle.acquire(req.accountID, now)
+            if wait:
+                self._queue(req, now + wait)
+                return None
+            if wait is None:
+                return throttled(req)
+        return self._dispatch(req)
+
+    def _queue(self, req, due):
+        heappush(self._queued, (due, self._queued_count, req))
+        self._queued_count += 1
+
+    @property
+    def queued(self):
+        return len(self._queued)
+
+    @property
+    def due(self):
+        """When the first queued request is due, None if nothing is queued."""
+        return self._queued[0][0] if self._queued else None
+
+    def drain(self, now=None):
+        """Run the queued requests due by ``now`` and return them as [(req, result)].
+
+        ``now`` is the throttle's clock by default; ``float("inf")`` runs
+        everything still queued.
+        """
+        queued = self._queued
+        if not queued:
+            return []
+        if now is None:
+            now = self.throttle.clock()
+        done = []
+        while queued and queued[0][0] <= now:
+            req = heappop(queued)[2]
+            done.append((req, self._dispatch(req)))
+        return done
+
+    def _dispatch(self, req):
+        account = self._accounts.get(req.accountID, None)
+        if account is None:
+            logging.error("request | %s | account not found", req)
+            return missing(req)
+        try:
+            name = HANDLERS[req.__class__]
+        except KeyError:
+            logging.error("request | %s | not supported", req)
+            return None
+        result = getattr(account, name)(req)
+        if self.journal is not None:
+            self._record(req, result)
+        return result
+
+    def on_requests(self, reqs, now=None):
+        """Dispatch a batch of requests, returning one result per request in order.
+
+        Account and handler lookups are reused while consecutive requests share
+        the same account and type, and failures are logged once per batch.
+        """
+        accounts = self._accounts
+        throttle = self.throttle
+        results = []
+        append = results.append
+        failed = []
+        journal = self.journal
+        last_id = last_cls = None
+        account = handler = None
+        if throttle is not None and now is None:
+            now = throttle.clock()
+        for req in reqs:
+            if throttle is not None and req.__class__ in THROTTLED:
+                wait = throttle.acquire(req.accountID, now)
+                if wait:
+                    self._queue(req, now + wait)
+                    append(None)
+                    continue
+                if wait is None:
+                    append(throttled(req))
+                    continue
+            if req.accountID != last_id:
+                last_id = req.accountID
+                last_cls = None
+                account = accounts.get(last_id, None)
+            if account is None:
+                failed.append(req)
+                append(missing(req))
+                continue
+            if req.__class__ is not last_cls:
+                try:
+                    handler = getattr(account, HANDLERS[req.__class__])
+                except KeyError:
+                    failed.append(req)
+                    append(None)
+                    continue
+                last_cls = req.__class__
+            result = handler(req)
+            append(result)
+            if journal is not None:
+                self._record(req, result)
+        if failed:
+            logging.error("requests | %s failed of %s | first: %s", len(failed), len(results), failed[0])
+        return results
+
+    def on_trade(self, trade):
+        account = self._accounts.get(trade.accountID, None)
+        if account is None:
+            logging.error("on trade | %s | account not found", trade)
+            return False
+        if account.on_trade(trade):
+            if self.journal is not None:
+                self.journal.trade(trade)
+            return True
+        return False
+
+    def on_trades(self, trades):
+        """Route a batch of trades to their accounts, returning the on_trade results."""
+        accounts = self._accounts
+        results = []
+        append = results.append
+        lost = []
+        journal = self.journal
+        last_id = None
+        on_trade = None
+        for trade in trades:
+            if trade.accountID != last_id:
+                last_id = trade.accountID
+                account = accounts.get(last_id, None)
+                on_trade = None if account is None else account.on_trade
+            if on_trade is None:
+                lost.append(trade)
+                append(False)
+            elif on_trade(trade):
+                append(True)
+                if journal is not None:
+                    journal.trade(trade)
+            else:
+                append(False)
+        if lost:
+            logging.error("on trades | %s of %s for unknown accounts | first: %s", len(lost), len(results), lost[0])
+        return results
+
+    def expire(self, orders=None):
+        """Cancel the open orders of every account, or just ``orders``, and return them."""
+        if orders is not None:
+            grouped = {}
+            for order in orders:
+                grouped.setdefault(order.accountID, []).append(order.orderID)
+            targets = [(self._accounts[accountID], orderIDs) for accountID, orderIDs in grouped.items()
+                       if accountID in self._accounts]
+        else:
+            targets = [(account, None) for account in self._accounts.values()]
+        orders = []
+        for account, orderIDs in targets:
+            expired = account.expire(orderIDs)
+            if self.journal is not None:
+                for order in expired:
+                    self.journal.expire(order)
+            orders.extend(expired)
+        return orders
+
+    def _record(self, req, result):
+        cls = req.__class__
+        if cls is ReqOrder:
+            if result.unfilled > 0:
+                self.journal.order(result)
+        elif cls is CancelOrder:
+            if result.reason is CanceledReason.CLIENT:
+                self.journal.cancel(result)
+
+
+def throttled(req):
+    if req.__class__ is ReqOrder:
+        return Order(req.accountID, code=req.code, qty=req.qty, price=req.price, orderType=req.orderType,
+                     bsType=req.bsType, orderStatus=OrderStatus.CANCELED, canceled=req.qty,
+                     reason=CanceledReason.THROTTLE, time=req.time)
+    return Order(req.accountID, req.orderID, reason=CanceledReason.THROTTLE)
+
+
+def missing(req):
+    if isinstance(req, ReqOrder):
+        return Order(req.accountID, code=req.code, qty=req.qty, price=req.price, orderType=req.orderType,
+                     bsType=req.bsType, canceled=req.qty, reason=CanceledReason.MISSING, time=req.time)
+    if isinstance(req, CancelOrder):
+        return Order(req.accountID, req.orderID, reason=CanceledReason.MISSING)
+    return None
@@ -0,0 +1,211 @@
+"""Opt-in latency histograms and counters for the exchange and account hot paths.
+
+Nothing is measured unless ``instrument`` is called: it shadows the hot
+methods of one ExchangeCore or Account instance with timed wrappers, so the
+classes themselves carry no instrumentation cost. ``uninstrument`` puts the
+plain methods back.
+
+Stages (histograms of nanoseconds):
+
+    exchange.order      ExchangeCore.on_order
+    exchange.cancel     ExchangeCore.on_cancel
+    exchange.tick       ExchangeCore.on_tick, matching only (per code as
+                        exchange.tick.<code> with ``per_code``)
+    account.order       Account.on_req_order
+    account.trade       Account.on_trade
+    account.cancel      Account.on_cancel
+
+and per tick the histograms tick.scanned (orders handed to the transactor)
+and tick.trades, with running totals in the ticks, scanned and trades
+counters.
+"""
+from array import array
+from time import perf_counter_ns
+
+
+class Histogram(object):
+    """Fixed-bucket log-linear histogram of non-negative integers, HDR style.
+
+    Values below ``2 * sub`` are counted exactly; above, each power of two is
+    split into ``sub`` buckets, so the relative error stays below 1 / ``sub``.
+    Values above ``highest`` are counted in the last bucket.
+    """
+
+    def __init__(self, sub_bits=7, highest=2**40):
+        self.sub_bits = sub_bits
+        self.highest = highest
+        self._half = 1 << sub_bits
+        self._bits = sub_bits + 1
+        self._top = self.index(highest)
+        self.counts = array("q", bytes(8 * (self._top + 1)))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def index(self, value):
+        shift = value.bit_length() - self._bits
+        if shift <= 0:
+            return value
+        return shift * self._half + (value >> shift)
+
+    def value(self, index):
+        """The lowest value counted in bucket ``index``."""
+        if index < 2 * self._half:
+            return index
+        shift = index // self._half - 1
+        return (index - shift * self._half) << shift
+
+    def record(self, value):
+        i = self.index(value)
+        self.counts[i if i < self._top else self._top] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        if not self.count:
+            return 0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.max if i == self._top else min(self.value(i), self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0,
+            "min": self.min or 0,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "p999": self.percentile(0.999),
+            "max": self.max or 0,
+        }
+
+    def reset(self):
+        self.counts = array("q", bytes(8 * (self._top + 1)))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+
+class Metrics(object):
+
+    def __init__(self, clock=perf_counter_ns, sub_bits=7):
+        self.clock = clock
+        self.sub_bits = sub_bits
+        self.histograms = {}
+        self.counters = {}
+
+    def histogram(self, name):
+        try:
+            return self.histograms[name]
+        except KeyError:
+            histogram = self.histograms[name] = Histogram(self.sub_bits)
+            return histogram
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self, reset=False):
+        result = {
+            "histograms": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            "counters": dict(self.counters),
+        }
+        if reset:
+            self.reset()
+        return result
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        for name in self.counters:
+            self.counters[name] = 0
+
+
+def timed(metrics, name, func):
+    histogram = metrics.histogram(name)
+    clock = metrics.clock
+
+    def wrapper(*args):
+        start = clock()
+        result = func(*args)
+        histogram.record(clock() - start)
+        return result
+
+    return wrapper
+
+
+def instrument_exchange(exchange, metrics, per_code=False):
+    clock = metrics.clock
+    counters = metrics.counters
+    tick_time = metrics.histogram("exchange.tick")
+    scanned = metrics.histogram("tick.scanned")
+    trade_count = metrics.histogram("tick.trades")
+    for name in ("ticks", "scanned", "trades"):
+        counters.setdefault(name, 0)
+    on_tick = exchange.on_tick
+    transactor = exchange.transactor
+    funcs = dict(transactor.funcs)
+    calls = [0]
+
+    def counted(func):
+        def wrapper(order, tick):
+            calls[0] += 1
+            return func(order, tick)
+        return wrapper
+
+    transactor.funcs = {key: counted(func) for key, func in funcs.items()}
+
+    def timed_tick(tick):
+        calls[0] = 0
+        start = clock()
+        trades = list(on_tick(tick))
+        elapsed = clock() - start
+        tick_time.record(elapsed)
+        if per_code:
+            metrics.histogram("exchange.tick." + tick["code"]).record(elapsed)
+        scanned.record(calls[0])
+        trade_count.record(len(trades))
+        counters["ticks"] += 1
+        counters["scanned"] += calls[0]
+        counters["trades"] += len(trades)
+        return trades
+
+    exchange.on_tick = timed_tick
+    exchange.on_order = timed(metrics, "exchange.order", exchange.on_order)
+    exchange.on_cancel = timed(metrics, "exchange.cancel", exchange.on_cancel)
+    exchange._uninstrument = (("on_tick", "on_order", "on_cancel"), transactor, funcs)
+    return exchange
+
+
+def instrument_account(account, metrics):
+    account.on_req_order = timed(metrics, "account.order", account.on_req_order)
+    account.on_trade = timed(metrics, "account.trade", account.on_trade)
+    account.on_cancel = timed(metrics, "account.cancel", account.on_cancel)
+    account._uninstrument = (("on_req_order", "on_trade", "on_cancel"), None, None)
+    return account
+
+
+def instrument(obj, metrics, **kwargs):
+    """Instrument an ExchangeCore or an Account (anything with on_req_order) and return it."""
+    if hasattr(obj, "on_req_order"):
+        return instrument_account(obj, metrics)
+    return instrument_exchange(obj, metrics, **kwargs)
+
+
+def uninstrument(obj):
+    names, transactor, funcs = obj.__dict__.pop("_uninstrument", ((), None, None))
+    for name in names:
+        obj.__dict__.pop(name, None)
+    if transactor is not None:
+        transactor.funcs = funcs
+    return obj
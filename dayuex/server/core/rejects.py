@@ -0,0 +1,58 @@
+from dayuex.module.enums import TradeReject
+from collections import deque
+import logging
+
+
+class RejectLog(object):
+    """Counts rejected trades and keeps the latest ones as plain tuples.
+
+    Records are (reason, accountID, orderID, tradeID, code, qty, price) and are
+    only formatted by an explicit ``emit``, when the root logger is enabled
+    for errors. Every ``size`` rejects a single summary line with the counts
+    is logged instead. At most ``size`` records are buffered, older ones are
+    dropped but still counted.
+    """
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.counts = {reason: 0 for reason in TradeReject if reason is not TradeReject.NONE}
+        self.total = 0
+        self._records = deque(maxlen=size)
+        # rejects since the last summary
+        self._pending = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, reason, accountID, trade):
+        self.counts[reason] += 1
+        self.total += 1
+        self._records.append((reason, accountID, trade.orderID, trade.tradeID, trade.code, trade.qty, trade.price))
+        self._pending += 1
+        if self._pending >= self.size:
+            self.summary()
+
+    def drain(self):
+        """Take the buffered records."""
+        records = list(self._records)
+        self._records.clear()
+        return records
+
+    def emit(self):
+        """Log the buffered records, if errors are logged at all, and return how many were taken."""
+        records = self.drain()
+        if records and logging.getLogger().isEnabledFor(logging.ERROR):
+            for reason, accountID, orderID, tradeID, code, qty, price in records:
+                logging.error("on trade | %s | account %s | order %s | trade %s | %s %s@%s",
+                              reason.name, accountID, orderID, tradeID, code, qty, price)
+        return len(records)
+
+    def summary(self):
+        """Log one line with the reject counts, if errors are logged at all."""
+        if logging.getLogger().isEnabledFor(logging.ERROR):
+            logging.error("on trade | %s rejected, %s since the last summary | %s", self.total, self._pending,
+                          " ".join("{} {}".format(reason.name, count) for reason, count in self.counts.items()))
+        self._pending = 0
+
+    def snapshot(self):
+        return {"total": self.total, "counts": {reason.name: count for reason, count in self.counts.items()}}
@@ -0,0 +1,113 @@
+from dayuex.module.enums import BSType, CanceledReason
+from collections import deque
+import time
+
+
+BUY = BSType.BUY.value
+
+
+class Firm(object):
+    """Exposure shared by the Risk of many accounts, with a firm-wide limit."""
+
+    def __init__(self, exposure=None):
+        self.limit = exposure
+        self.exposure = 0
+
+
+class Risk(object):
+    """Pre-trade limits of one account, checked by Account.on_req_order.
+
+    notional    max price * qty of one order
+    position    max quantity held plus pending buys, per code
+    exposure    max cost of held positions plus the notional of pending buys
+    rate        max orders passing the check per second of ``clock``
+    firm        a Firm whose exposure limit applies to all accounts sharing it
+
+    None disables a limit. The aggregates are kept up to date by the account
+    on every accepted order, trade and cancel, so ``check`` is O(1). Positions
+    an account starts with are counted at zero cost. A market buy counts at
+    its price, the collar it cannot fill beyond.
+    """
+
+    def __init__(self, notional=None, position=None, exposure=None, rate=None, firm=None, clock=time.monotonic):
+        self.notional = notional
+        self.position = position
+        self.exposure_limit = exposure
+        self.rate = rate
+        self.firm = firm
+        self.clock = clock
+        self.exposure = 0
+        # code -> quantity held plus pending buys
+        self._long = {}
+        # code -> [quantity held, cost]
+        self._held = {}
+        self._times = deque()
+
+    def attach(self, account):
+        """Seed the aggregates from an account's positions and open orders."""
+        for code, position in account._positions.items():
+            qty = position.available + position.frozen + position.today
+            self._held[code] = [qty, 0]
+            self._long[code] = self._long.get(code, 0) + qty
+        for order in account._orders.values():
+            self.on_order(order)
+        return self
+
+    def check(self, order):
+        """The CanceledReason to reject ``order`` for, None when it passes."""
+        if self.rate is not None:
+            now = self.clock()
+            times = self._times
+            while times and times[0] <= now - 1:
+                times.popleft()
+            if len(times) >= self.rate:
+                return CanceledReason.RATE
+        notional = order.price * order.qty
+        if self.notional is not None and notional > self.notional:
+            return CanceledReason.NOTIONAL
+        if order.bsType.value == BUY:
+            if self.position is not None and self._long.get(order.code, 0) + order.qty > self.position:
+                return CanceledReason.POSITION_LIMIT
+            if self.exposure_limit is not None and self.exposure + notional > self.exposure_limit:
+                return CanceledReason.EXPOSURE
+            firm = self.firm
+            if firm is not None and firm.limit is not None and firm.exposure + notional > firm.limit:
+                return CanceledReason.EXPOSURE
+        if self.rate is not None:
+            self._times.append(now)
+        return None
+
+    def _expose(self, value):
+        self.exposure += value
+        if self.firm is not None:
+            self.firm.exposure += value
+
+    def on_order(self, order):
+        if order.bsType.value == BUY:
+            qty = order.unfilled
+            self._long[order.code] = self._long.get(order.code, 0) + qty
+            self._expose(qty * order.price)
+
+    def on_trade(self, order, trade):
+        qty = trade.qty
+        held = self._held.get(trade.code, None)
+        if held is None:
+            held = self._held[trade.code] = [0, 0]
+        if order.bsType.value == BUY:
+            held[0] += qty
+            held[1] += qty * trade.price
+            self._expose(qty * (trade.price - order.price))
+        else:
+            cost = held[1] * qty // held[0] if held[0] else 0
+            held[0] -= qty
+            held[1] -= cost
+            self._long[trade.code] = self._long.get(trade.code, 0) - qty
+            self._expose(-cost)
+
+    def on_cancel(self, order):
+        """Called before ``order`` is canceled, while ``unfilled`` is what gets canceled."""
+        if order.bsType.value == BUY:
+            qty = order.unfilled
+            self._long[order.code] -= qty
+            self._expose(-qty * order.price)
+
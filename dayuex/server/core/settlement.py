@@ -0,0 +1,101 @@
+from dayuex.server.core.manager import AccountManager
+import numpy as np
+import logging
+
+
+class Settlement(object):
+    """End-of-day processing over every account of an AccountManager.
+
+    ``run(closes)`` expires the orders still open in the accounts and the
+    exchange, rolls positions over to the next day and marks every account
+    to market. ``positions`` is the PositionLedger the accounts keep their
+    positions in, if any; it is rolled and valued with whole-column numpy
+    operations, otherwise positions are read from the accounts in one pass.
+    With a journal on the AccountManager the expired orders and the roll are
+    journaled, so ``replay`` rolls over at the same point.
+    """
+
+    def __init__(self, accounts=None, exchange=None, positions=None):
+        self.accounts = accounts if isinstance(accounts, AccountManager) else AccountManager(accounts)
+        self.exchange = exchange
+        self.positions = positions
+        self.equity = {}
+        self.pnl = {}
+
+    def run(self, closes):
+        """Settle the day at ``closes`` ({code: closing price}) and return {accountID: equity}.
+
+        ``pnl`` is updated with the change of equity of the accounts settled
+        on the previous run as well.
+        """
+        self.expire()
+        self.roll()
+        equity = self.mark(closes)
+        last = self.equity
+        self.pnl = {accountID: value - last[accountID] for accountID, value in equity.items() if accountID in last}
+        self.equity = equity
+        return equity
+
+    def expire(self):
+        orders = self.accounts.expire()
+        if self.exchange is not None:
+            self.exchange.clear()
+        return orders
+
+    def roll(self):
+        if self.positions is not None:
+            self.positions.day_off()
+        else:
+            for account in self.accounts:
+                for position in account._positions.values():
+                    position.day_off()
+        if self.accounts.journal is not None:
+            self.accounts.journal.day_off()
+
+    def mark(self, closes):
+        """Cash plus positions valued at ``closes``, as {accountID: equity}.
+
+        Positions of codes without a closing price are valued at 0.
+        """
+        accounts = list(self.accounts)
+        ids = np.array([account.accountID for account in accounts], np.int64)
+        equity = np.array([account._cash.available + account._cash.frozen for account in accounts], np.int64)
+        if self.positions is not None:
+            rows, codes, qty = self._ledger_columns(ids)
+        else:
+            rows, codes, qty = self._account_columns(accounts)
+
+        prices = np.array([closes.get(code, 0) for code in codes], np.int64)
+        missing = [code for code in codes if code not in closes]
+        if missing:
+            logging.error("mark | %s codes without close | first: %s", len(missing), missing[0])
+        code_index, qty = qty
+        np.add.at(equity, rows, qty * prices[code_index])
+        return dict(zip(ids.tolist(), equity.tolist()))
+
+    def _ledger_columns(self, ids):
+        ledger = self.positions
+        owners = np.frombuffer(ledger.accountIDs, np.int64)
+        qty = sum(np.frombuffer(getattr(ledger, name), np.int64) for name in ("available", "frozen", "today"))
+        code_index = np.frombuffer(ledger.code_index, np.int32)
+        if not len(ids):
+            return np.zeros(0, np.intp), ledger.codes, (code_index[:0], qty[:0])
+        # slots of accounts outside the manager are left out
+        order = np.argsort(ids)
+        rows = order[np.minimum(np.searchsorted(ids, owners, sorter=order), len(ids) - 1)]
+        known = ids[rows] == owners
+        return rows[known], ledger.codes, (code_index[known], qty[known])
+
+    @staticmethod
+    def _account_columns(accounts):
+        rows = []
+        code_index = []
+        qty = []
+        codes = {}
+        for row, account in enumerate(accounts):
+            for code, position in account._positions.items():
+                rows.append(row)
+                code_index.append(codes.setdefault(code, len(codes)))
+                qty.append(position.available + position.frozen + position.today)
+        return (np.array(rows, np.intp), list(codes),
+                (np.array(code_index, np.intp), np.array(qty, np.int64)))
@@ -0,0 +1,160 @@
+from dayuex.server.core.exchange import ExchangeCore, Transactor, CODE, IMMEDIATE
+from dayuex.server.core.ids import BlockIDGenerator
+from multiprocessing import Pipe, Process
+from heapq import merge
+from zlib import crc32
+import logging
+import os
+
+
+ORDER = 0
+CANCEL = 1
+TICK = 2
+CLEAR = 3
+
+
+def serve(conn, transactor):
+    exchange = ExchangeCore(transactor=transactor())
+    while True:
+        commands = conn.recv()
+        if commands is None:
+            break
+        results = []
+        for command in commands:
+            kind = command[0]
+            if kind == TICK:
+                trades = list(exchange.on_tick(command[2]))
+                if trades:
+                    results.append((command[1], trades))
+            elif kind == ORDER:
+                trades = exchange.on_order(command[1])
+                if trades:
+                    results.append((command[2], trades))
+            elif kind == CLEAR:
+                exchange.clear()
+            else:
+                exchange.on_cancel(command[1])
+        conn.send(results)
+    conn.close()
+
+
+class ShardedExchange(object):
+    """ExchangeCore split by code across worker processes.
+
+    Orders, cancels and ticks are buffered per shard and sent in one message
+    per shard on ``flush``; trades come back tagged with their tick's sequence
+    number and are merged in feed order. Trade IDs are assigned here, in that
+    order, so a run gives the same trades as a single ExchangeCore using the
+    same ``ids`` and ``transactor``.
+
+    Market, IOC and FOK orders get a sequence number like a tick, and their
+    trades come back from ``flush`` in that place; cancelling what is left of
+    them is up to the caller, as with ExchangeCore.
+    """
+
+    def __init__(self, shards=None, transactor=Transactor, ids=None):
+        self.shards = shards if shards else os.cpu_count()
+        self.ids = ids if hasattr(ids, "next") else BlockIDGenerator.year()
+        self._conns = []
+        self._procs = []
+        for i in range(self.shards):
+            parent, child = Pipe()
+            proc = Process(target=serve, args=(child, transactor), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        self._pending = [[] for i in range(self.shards)]
+        self._owner = {}
+        self._seq = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def shard(self, code):
+        return crc32(code.encode()) % self.shards
+
+    def on_order(self, order):
+        i = self.shard(order.code)
+        if order.orderType.value in IMMEDIATE:
+            self._pending[i].append((ORDER, order, self._seq))
+            self._seq += 1
+            return
+        self._owner[order.orderID] = [i, order.unfilled]
+        self._pending[i].append((ORDER, order))
+
+    def on_cancel(self, cancel):
+        try:
+            i, unfilled = self._owner.pop(cancel.orderID)
+        except KeyError:
+            logging.error("cancel order | %s | order not found", cancel)
+            return False
+        self._pending[i].append((CANCEL, cancel))
+        return True
+
+    def clear(self):
+        """Drop every resting order on every shard once the buffered commands ran.
+
+        Like orders and cancels, this is sent on the next ``flush``.
+        """
+        count = len(self._owner)
+        self._owner = {}
+        for pending in self._pending:
+            pending.append((CLEAR,))
+        return count
+
+    def on_tick(self, tick):
+        self.put(tick)
+        return self.flush()
+
+    def on_ticks(self, ticks):
+        for tick in ticks:
+            self.put(tick)
+        return self.flush()
+
+    def put(self, tick):
+        self._pending[self.shard(tick[CODE])].append((TICK, self._seq, tick))
+        self._seq += 1
+
+    def flush(self):
+        """Send everything buffered to the shards and return the trades in tick order."""
+        busy = []
+        for i, commands in enumerate(self._pending):
+            if commands:
+                self._conns[i].send(commands)
+                self._pending[i] = []
+                busy.append(i)
+        replies = [self._conns[i].recv() for i in busy]
+
+        trades = []
+        owner = self._owner
+        ids = self.ids
+        for seq, batch in merge(*replies, key=first):
+            for trade in batch:
+                trade.tradeID = ids.next()
+                left = owner.get(trade.orderID, None)
+                if left is not None:
+                    left[1] -= trade.qty
+                    if left[1] <= 0:
+                        del owner[trade.orderID]
+                trades.append(trade)
+        return trades
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(None)
+                conn.close()
+            except (OSError, BrokenPipeError):
+                pass
+        for proc in self._procs:
+            proc.join()
+        self._conns = []
+        self._procs = []
+
+
+def first(item):
+    return item[0]
@@ -0,0 +1,40 @@
+import time
+
+
+class Throttle(object):
+    """Token buckets keyed by accountID, for requests entering AccountManager.
+
+    Every account starts with ``burst`` tokens, refilled at ``rate`` per second
+    of ``clock``; each throttled request takes one. A request finding the
+    bucket empty is rejected, or with ``delay`` may borrow against the refill
+    and be queued for at most ``delay`` seconds. Buckets are plain
+    [tokens, last time] lists updated in place.
+    """
+
+    def __init__(self, rate, burst=None, delay=0, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.delay = delay
+        self.clock = clock
+        self._floor = -delay * rate
+        self._buckets = {}
+
+    def acquire(self, accountID, now=None):
+        """Take a token: 0 to run the request now, seconds to hold it for, None to reject it."""
+        if now is None:
+            now = self.clock()
+        bucket = self._buckets.get(accountID, None)
+        if bucket is None:
+            bucket = self._buckets[accountID] = [self.burst, now]
+        tokens = bucket[0] + (now - bucket[1]) * self.rate
+        if tokens > self.burst:
+            tokens = self.burst
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0
+        if tokens - 1 < self._floor:
+            bucket[0] = tokens
+            return None
+        bucket[0] = tokens - 1
+        return (1 - tokens) / self.rate
@@ -0,0 +1,172 @@
+"""asyncio TCP front-end for the account and exchange cores.
+
+Requests from dayuex.module.request are answered in order with RESPONSE
+frames (see dayuex.module.wire). Trades for the accounts a connection has
+sent requests for are pushed as UPDATE frames, both those of ticks and
+those of market, IOC and FOK orders filled as they are accepted. Outgoing
+frames are buffered per connection and written once per event-loop
+iteration.
+
+A request the account throttle queues is answered with None at once. Its
+result is pushed as an UPDATE once ``drain`` runs it, which the server
+schedules for when the first queued request is due. With a journal on the
+accounts its due records are committed on a timer, so they do not wait for
+the next request.
+"""
+from dayuex.server.core.engine import Engine
+from dayuex.module.wire import frame, frames, RESPONSE, UPDATE
+import asyncio
+import logging
+import struct
+
+
+class Connection(asyncio.Protocol):
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.accounts = set()
+        self._in = bytearray()
+        self._out = bytearray()
+        self._scheduled = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.server.unsubscribe(self)
+        self.transport = None
+
+    def data_received(self, data):
+        self._in += data
+        server = self.server
+        for flag, req in frames(self._in):
+            if req.accountID not in self.accounts:
+                server.subscribe(self, req.accountID)
+            self.send(RESPONSE, server.on_request(req))
+            server.push_fills()
+
+    def send(self, flag, obj):
+        try:
+            frame(self._out, flag, obj)
+        except (struct.error, KeyError) as e:
+            # a response is still owed, so the ones after it keep their order
+            logging.error("send | %s | %s", obj, e)
+            if flag != RESPONSE:
+                return
+            frame(self._out, flag, None)
+        if not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        self._scheduled = False
+        if self._out and self.transport is not None and not self.transport.is_closing():
+            self.transport.write(bytes(self._out))
+        self._out.clear()
+
+
+class Server(object):
+
+    def __init__(self, engine=None):
+        self.engine = engine if isinstance(engine, Engine) else Engine()
+        self._subscribers = {}
+        self._server = None
+        self._drain = None
+        self._drain_at = None
+        self._commit = None
+
+    def subscribe(self, connection, accountID):
+        connection.accounts.add(accountID)
+        self._subscribers.setdefault(accountID, set()).add(connection)
+
+    def unsubscribe(self, connection):
+        for accountID in connection.accounts:
+            subscribers = self._subscribers.get(accountID, None)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self._subscribers[accountID]
+        connection.accounts.clear()
+
+    def on_request(self, req):
+        try:
+            result = self.engine.on_request(req)
+        except Exception as e:
+            logging.error("request | %s | %s", req, e)
+            return None
+        if self.engine.accounts.queued:
+            self._schedule()
+        return result
+
+    def _schedule(self):
+        accounts = self.engine.accounts
+        due = accounts.due
+        if self._drain is not None:
+            if self._drain_at <= due:
+                return
+            self._drain.cancel()
+        self._drain_at = due
+        self._drain = asyncio.get_running_loop().call_later(
+            max(0.0, due - accounts.throttle.clock()), self.drain)
+
+    def drain(self):
+        """Run the queued requests that are due and push their results."""
+        self._drain = None
+        subscribers = self._subscribers
+        for result in self.engine.drain():
+            if result is not None:
+                for connection in subscribers.get(result.accountID, ()):
+                    connection.send(UPDATE, result)
+        self.push_fills()
+        if self.engine.accounts.queued:
+            self._schedule()
+
+    def push_fills(self):
+        """Push the trades of market, IOC and FOK orders the engine collected."""
+        if self.engine.fills:
+            subscribers = self._subscribers
+            for trade in self.engine.take_fills():
+                for connection in subscribers.get(trade.accountID, ()):
+                    connection.send(UPDATE, trade)
+
+    def on_tick(self, tick):
+        subscribers = self._subscribers
+        for trade in self.engine.on_tick(tick):
+            for connection in subscribers.get(trade.accountID, ()):
+                connection.send(UPDATE, trade)
+
+    async def feed(self, ticks):
+        """Match an iterable of ticks, yielding to the event loop between ticks."""
+        for tick in ticks:
+            self.on_tick(tick)
+            await asyncio.sleep(0)
+
+    async def start(self, host="127.0.0.1", port=0):
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(lambda: Connection(self), host, port)
+        if self.engine.accounts.journal is not None:
+            self._commit = loop.call_later(self.engine.accounts.journal.interval, self.commit_journal)
+        return self._server
+
+    def commit_journal(self):
+        """Commit the journal's due records and check again after its interval."""
+        journal = self.engine.accounts.journal
+        journal.commit_due()
+        self._commit = asyncio.get_running_loop().call_later(journal.interval, self.commit_journal)
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._commit is not None:
+            self._commit.cancel()
+            self._commit = None
+        if self._drain is not None:
+            self._drain.cancel()
+            self._drain = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -1,5 +1,6 @@
 import unittest
-from dayuex.server.core.account import Account
+from dayuex.server.core.account import Account, AccountOrderIDGenerator
+from dayuex.server.core.rejects import RejectLog
 from dayuex.module import storage, request, enums
 from datetime import datetime
 
@@ -107,6 +108,57 @@ class TextAccountCore(unittest.TestCase):
         result = self.account.on_cancel(request.CancelOrder(self.id, 30))
         self.assertEqual(result.reason, enums.CanceledReason.MISSING)
 
+    def test_order_ids(self):
+        ids = AccountOrderIDGenerator(self.id, block=4)
+        generated = [ids.next() for i in range(10)]
+        self.assertEqual(generated, sorted(set(generated)))
+        self.assertEqual(generated[0] >> 38, self.id)
+
+        self.account = Account(self.id, storage.Cash(self.id, self.price(1000000)),
+                               ids=AccountOrderIDGenerator(self.id, clock=None))
+        self.buy_req()
+        self.assertEqual(self.order.orderID, (self.id << 38) + 1)
+        reserved = self.account._id.reserve(3)
+        self.assertEqual(list(reserved), [(self.id << 38) + i for i in (2, 3, 4)])
+        self.assertEqual(self.account._id.next(), (self.id << 38) + 5)
+
+    def test_rejects(self):
+        self.buy_req()
+        order = self.order
+        price = self.price(10.5)
+        cases = [
+            (storage.Trade(self.id, 30, 1, "000002", 100, price), enums.TradeReject.ORDER),
+            (storage.Trade(self.id, order.orderID, 2, "000002", 1100, price), enums.TradeReject.QTY),
+            (storage.Trade(self.id, order.orderID, 3, "000002", 1000, price + 1), enums.TradeReject.AMOUNT),
+        ]
+        frozen = self.account._cash.frozen
+        for trade, reason in cases:
+            self.assertEqual(self.account.apply_trade(trade), reason)
+            self.assertFalse(self.account.on_trade(trade))
+        self.assertEqual(self.account._cash.frozen, frozen)
+        self.assertEqual(order.cumQty, 0)
+        self.assertEqual(self.account.rejects.total, 6)
+        self.assertEqual(self.account.rejects.snapshot()["counts"]["QTY"], 2)
+        self.assertEqual(len(self.account.rejects), 6)
+        with self.assertLogs(level="ERROR") as logs:
+            self.assertEqual(self.account.rejects.emit(), 6)
+        self.assertIn("AMOUNT", logs.output[-1])
+        self.assertEqual(len(self.account.rejects), 0)
+        rejects = RejectLog(size=2)
+        with self.assertLogs(level="ERROR") as logs:
+            for trade, reason in cases:
+                rejects.add(reason, self.id, trade)
+            rejects.add(enums.TradeReject.QTY, self.id, cases[1][0])
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn("| 2 rejected, 2 since the last summary | ORDER 1 QTY 1 AMOUNT 0", logs.output[0])
+        self.assertIn("| 4 rejected, 2 since the last summary | ORDER 1 QTY 2 AMOUNT 1", logs.output[1])
+        self.assertEqual(len(rejects), 2)
+
+        sell = self.sell_req()
+        trade = storage.Trade(self.id, sell.orderID, 4, "000001", 700, self.price(20.34))
+        self.assertEqual(self.account.apply_trade(trade), enums.TradeReject.NONE)
+        self.assertEqual(trade.fee, int(700 * self.price(20.34) * self.account.sr))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+from dayuex.server.core.batch import BatchMatcher, tick_array, order_columns
+from dayuex.server.core.exchange import ExchangeCore, SharedTransactor
+from dayuex.module.storage import Order
+from dayuex.module.enums import OrderType, BSType
+
+
+class TestBatchMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.ticks = [
+            {
+                'date': 20171018,
+                'code': '300667.XSHE',
+                'ask': [[46.4, 2600], [46.41, 600], [46.42, 1300], [46.43, 2900], [46.44, 200]],
+                'time': 94109000,
+                'bid': [[46.39, 200], [46.29, 1000], [46.28, 400], [46.2, 300], [46.19, 600]]
+            },
+            {
+                'date': 20171018,
+                'code': '300667.XSHE',
+                'ask': [[46.41, 900], [46.42, 700]],
+                'time': 94112000,
+                'bid': [[46.3, 500], [46.25, 1000]]
+            },
+        ]
+
+    def orders(self):
+        return [
+            Order(orderID=0, code='300667.XSHE', qty=4000, price=46.42,
+                  orderType=OrderType.LIMIT, bsType=BSType.BUY),
+            Order(orderID=1, code='300667.XSHE', qty=2000, price=46.27,
+                  orderType=OrderType.LIMIT, bsType=BSType.SELL),
+            Order(orderID=2, code='300667.XSHE', qty=3000, price=46.43,
+                  orderType=OrderType.LIMIT, bsType=BSType.BUY),
+            Order(orderID=3, code='300667.XSHE', qty=700, price=46.41,
+                  orderType=OrderType.LIMIT, bsType=BSType.BUY),
+        ]
+
+    def expect(self, transactor):
+        exchange = ExchangeCore(transactor=transactor)
+        for order in self.orders():
+            exchange.on_order(order)
+        return [(trade.orderID, trade.price, trade.qty)
+                for tick in self.ticks for trade in exchange.on_tick(tick)]
+
+    def result(self, shared):
+        matcher = BatchMatcher(order_columns(self.orders()), shared)
+        fills = matcher.match(tick_array(self.ticks))
+        return [(int(fill["orderID"]), float(fill["price"]), int(fill["qty"])) for fill in fills]
+
+    def test_full_depth(self):
+        self.assertEqual(self.result(False), self.expect(None))
+
+    def test_shared(self):
+        self.assertEqual(self.result(True), self.expect(SharedTransactor()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import threading
+from dayuex.server.core.bus import EventBus, DROP, BLOCK, COALESCE
+from dayuex.server.core.account import Account
+from dayuex.server.core.engine import Engine
+from dayuex.module import storage, request, enums
+from dayuex.module.enums import EventType
+from datetime import datetime
+
+
+class TestBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = EventBus(batch=1000)
+
+    def trade(self, accountID, code, tradeID):
+        return storage.Trade(accountID, 1, tradeID, code, 100, 10)
+
+    def test_filter(self):
+        everything = self.bus.subscribe()
+        account = self.bus.subscribe(accountID=1)
+        trades = self.bus.subscribe(EventType.TRADE, code="A")
+        self.bus.publish(EventType.TRADE, self.trade(1, "A", 1))
+        self.bus.publish(EventType.TRADE, self.trade(2, "A", 2))
+        self.bus.publish(EventType.CASH, storage.Cash(1, 100))
+        self.assertEqual(len(everything), 0)
+        self.bus.flush()
+        self.assertEqual(len(everything.poll()), 3)
+        self.assertEqual([event.accountID for kind, event in account.poll()], [1, 1])
+        self.assertEqual([event.tradeID for kind, event in trades.poll()], [1, 2])
+
+        self.bus.unsubscribe(everything)
+        self.bus.publish(EventType.CASH, storage.Cash(1, 100))
+        self.bus.flush()
+        self.assertEqual(len(everything), 0)
+        self.assertEqual(len(account), 1)
+
+    def test_drop(self):
+        subscription = self.bus.subscribe(maxlen=3, policy=DROP)
+        for i in range(5):
+            self.bus.publish(EventType.TRADE, self.trade(1, "A", i))
+        self.bus.flush()
+        self.assertEqual([event.tradeID for kind, event in subscription.poll()], [2, 3, 4])
+        self.assertEqual(subscription.dropped, 2)
+
+    def test_coalesce(self):
+        subscription = self.bus.subscribe(policy=COALESCE)
+        cash = storage.Cash(1, 100)
+        for i in range(3):
+            cash.available = i
+            self.bus.publish(EventType.CASH, cash)
+        self.bus.publish(EventType.POSITION, storage.Position(1, "A", 100))
+        self.bus.flush()
+        events = subscription.poll()
+        self.assertEqual([kind for kind, event in events], [EventType.CASH, EventType.POSITION])
+        self.assertEqual(events[0][1].available, 2)
+
+    def test_block(self):
+        subscription = self.bus.subscribe(maxlen=2, policy=BLOCK, timeout=5)
+        for i in range(6):
+            self.bus.publish(EventType.TRADE, self.trade(1, "A", i))
+        received = []
+
+        def consume():
+            while len(received) < 6:
+                received.extend(subscription.get(timeout=5))
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        self.bus.flush()
+        consumer.join(5)
+        self.assertEqual([event.tradeID for kind, event in received], list(range(6)))
+        self.assertEqual(subscription.dropped, 0)
+
+    def test_engine(self):
+        account = Account(7, storage.Cash(7, 10**10))
+        engine = Engine([account], bus=self.bus)
+        subscription = self.bus.subscribe(accountID=7)
+        tick = {'date': 20171018, 'code': '300667.XSHE', 'time': 94109000,
+                'ask': [[464000, 2600]], 'bid': [[463900, 200]]}
+        req = request.ReqOrder(7, "300667.XSHE", 3000, 464000, enums.OrderType.LIMIT, enums.BSType.BUY,
+                               datetime(2017, 10, 18, 9, 41, 0))
+        list(engine.run([tick, dict(tick, time=94112000), dict(tick, time=94115000)], [req]))
+        events = subscription.poll()
+        self.assertEqual([kind for kind, event in events], [EventType.ORDER] + [
+            EventType.TRADE, EventType.ORDER, EventType.CASH, EventType.POSITION] * 2)
+        self.assertEqual([event.cumQty for kind, event in events if kind is EventType.ORDER], [0, 2600, 3000])
+        self.assertEqual([event.today for kind, event in events if kind is EventType.POSITION], [2600, 3000])
+        cash = [event for kind, event in events if kind is EventType.CASH]
+        self.assertGreater(cash[0].frozen, cash[1].frozen)
+        self.assertIsNot(cash[1], account._cash)
+
+
+if __name__ == '__main__':
+    unittest.main()
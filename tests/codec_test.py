@@ -0,0 +1,88 @@
+import unittest
+from dayuex.module.codec import Codec, codec, CLASSES
+from dayuex.module import storage, request, enums
+from dayuex.module.wire import frame, frames, RESPONSE, UPDATE
+from datetime import datetime
+import struct
+
+
+class TestCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.order = storage.Order(
+            1367, 2**40 + 5, "000001.XSHE", 1000, 300, 105000, enums.OrderType.LIMIT, enums.BSType.SELL,
+            enums.OrderStatus.UNFILLED, 105000000, 52500, 31500000, 15750, 0, enums.CanceledReason.NONE,
+            datetime(2017, 10, 18, 9, 30, 0, 123000), 1508290200000
+        )
+
+    def fields(self, obj):
+        return [getattr(obj, name) for name in obj.__slots__]
+
+    def test_roundtrip(self):
+        for cls in CLASSES:
+            obj = cls()
+            if hasattr(obj, "code"):
+                obj.code = "600000.XSHG"
+            if hasattr(obj, "price"):
+                obj.price = 0
+            obj.accountID = 11
+            copy = codec(cls).unpack(codec(cls).pack(obj))
+            self.assertIs(copy.__class__, cls)
+            expected = [-1 if value is None and name in ("orderType", "bsType") else value
+                        for name, value in zip(cls.__slots__, self.fields(obj))]
+            self.assertEqual([getattr(value, "value", value) for value in self.fields(copy)], [
+                getattr(value, "value", value) for value in expected
+            ])
+        copy = codec(storage.Order).unpack(codec(storage.Order).pack(self.order))
+        self.assertEqual(self.fields(copy), self.fields(self.order))
+
+    def test_many(self):
+        coder = codec(storage.Order)
+        orders = [self.order, storage.Order(2, 3, "000002.XSHE", 100, price=99)]
+        buffer = bytearray(8 + coder.size * 2)
+        self.assertEqual(coder.pack_many(orders, memoryview(buffer), 8), len(buffer))
+        copies = coder.unpack_many(buffer, offset=8)
+        self.assertEqual([self.fields(order) for order in copies], [self.fields(order) for order in orders])
+        self.assertEqual(len(coder.pack_many(orders)), coder.size * 2)
+
+    def test_float_price(self):
+        coder = Codec(storage.Trade, price="d")
+        trade = storage.Trade(1, 2, 3, "300667.XSHE", 2600, 46.4, time=datetime(2017, 10, 18, 9, 41, 9))
+        self.assertEqual(coder.unpack(coder.pack(trade)).price, 46.4)
+
+    def test_coerce(self):
+        coder = codec(storage.Order)
+        self.assertEqual(coder.unpack(coder.pack(storage.Order(7, reason=enums.CanceledReason.MISSING))).price, 0)
+        self.assertEqual(coder.unpack(coder.pack(storage.Order(7, price=105000.0))).price, 105000)
+        with self.assertRaises(struct.error):
+            coder.pack(storage.Order(7, price=104999.6))
+        coder = Codec(storage.Order, price="d")
+        self.assertEqual(coder.unpack(coder.pack(storage.Order(7, price=46.42))).price, 46.42)
+        buffer = bytearray(b"head")
+        with self.assertRaises(Exception):
+            frame(buffer, RESPONSE, storage.Order(7, qty=2**70))
+        self.assertEqual(buffer, b"head")
+
+    def test_frames(self):
+        buffer = bytearray()
+        frame(buffer, RESPONSE, self.order)
+        frame(buffer, UPDATE, None)
+        frame(buffer, RESPONSE, b"snapshot")
+        frame(buffer, RESPONSE, [])
+        frame(buffer, RESPONSE, [storage.Trade(7, 1, 2, "000001", 100, 1000), storage.Trade(7, 1, 3, "000001", 200)])
+        frame(buffer, RESPONSE, request.QryCash(7))
+        tail = bytes(buffer[-3:])
+        del buffer[-3:]
+        messages = frames(buffer)
+        self.assertEqual([flag for flag, obj in messages], [RESPONSE, UPDATE, RESPONSE, RESPONSE, RESPONSE])
+        self.assertEqual(self.fields(messages[0][1]), self.fields(self.order))
+        self.assertEqual(messages[2][1], b"snapshot")
+        self.assertEqual(messages[3][1], [])
+        self.assertEqual([(t.tradeID, t.qty) for t in messages[4][1]], [(2, 100), (3, 200)])
+        buffer += tail
+        self.assertEqual(frames(buffer)[0][1].accountID, 7)
+        self.assertEqual(len(buffer), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from dayuex.server.core.account import Account
+from dayuex.server.core.engine import Engine
+from dayuex.module import storage, request, enums
+from datetime import datetime
+
+
+class TestEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.id = 7
+        self.account = Account(self.id, storage.Cash(self.id, 10**10),
+                               {"300667.XSHE": storage.Position(self.id, "300667.XSHE", 1000, 1000)})
+        self.engine = Engine([self.account])
+        self.ticks = [
+            {'date': 20171018, 'code': '300667.XSHE', 'time': 94109000,
+             'ask': [[464000, 2600], [464100, 600]], 'bid': [[463900, 200], [462900, 1000]]},
+            {'date': 20171018, 'code': '300667.XSHE', 'time': 94112000,
+             'ask': [[464100, 300], [464200, 600]], 'bid': [[463800, 700], [462900, 1000]]},
+        ]
+
+    def req(self, qty, price, bsType, second):
+        return request.ReqOrder(self.id, "300667.XSHE", qty, price, enums.OrderType.LIMIT, bsType,
+                                datetime(2017, 10, 18, 9, 41, second))
+
+    def test_run(self):
+        buy = self.req(3000, 464100, enums.BSType.BUY, 0)
+        sell = self.req(800, 463800, enums.BSType.SELL, 10)
+        events = list(self.engine.run(self.ticks, [buy, sell]))
+        kinds = [event.__class__.__name__ for event in events]
+        self.assertEqual(kinds, ["Order", "Trade", "Trade", "Order", "Trade"])
+        order = events[0]
+        self.assertEqual(order.orderStatus, enums.OrderStatus.FILLED)
+        self.assertEqual(order.cumQty, 3000)
+        self.assertEqual(self.account._positions["300667.XSHE"].today, 3000)
+        self.assertEqual(events[3].cumQty, 700)
+        self.assertEqual(self.account._positions["300667.XSHE"].frozen, 100)
+
+    def test_untimed(self):
+        events = []
+
+        def requests():
+            yield self.req(3000, 464100, enums.BSType.BUY, 10)
+            yield request.CancelOrder(self.id, events[0].orderID)
+            yield request.QryCash(self.id)
+
+        for event in self.engine.run(self.ticks, requests()):
+            events.append(event)
+        order, canceled, cash = events
+        self.assertIs(canceled, order)
+        self.assertEqual((order.cumQty, order.reason), (0, enums.CanceledReason.CLIENT))
+        self.assertIs(cash, self.account._cash)
+        self.assertEqual(cash.frozen, 0)
+
+    def test_cancel(self):
+        buy = self.req(3000, 464000, enums.BSType.BUY, 0)
+        available = self.account._cash.available
+        events = list(self.engine.run(self.ticks[:1], [buy]))
+        order = events[0]
+        self.assertEqual(order.cumQty, 2600)
+        canceled = self.engine.on_request(request.CancelOrder(self.id, order.orderID))
+        self.assertEqual(canceled.canceled, 400)
+        self.assertEqual(self.account._cash.frozen, 0)
+        self.assertEqual(self.account._cash.available, available - order.cumAmt - order.cumFee)
+        self.assertEqual(list(self.engine.on_tick(self.ticks[0])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
-from dayuex.server.core.exchange import ExchangeCore
+from dayuex.server.core.exchange import ExchangeCore, SharedTransactor, Transactor, epoch_ms, combine
 from dayuex.module.storage import Order
+from dayuex.module.request import CancelOrder
 from dayuex.module.enums import OrderType, BSType
 
 
@@ -25,7 +26,7 @@ class TestExchangeCore(unittest.TestCase):
         amount = 0
         for trade in self.exchange.on_tick(self.tick):
             amount += trade.price * trade.qty
-        self.assertEqual(amount, 148486)
+        self.assertEqual(amount, 185622)
         self.assertEqual(self.order_buy.unfilled, 0)
 
     def test_sell(self):
@@ -36,6 +37,85 @@ class TestExchangeCore(unittest.TestCase):
         self.assertEqual(amount, 74080)
         self.assertEqual(self.order_sell.unfilled, 400)
 
+    def test_book(self):
+        resting = Order(orderID=2, code='300667.XSHE', qty=100, price=46.3,
+                        orderType=OrderType.LIMIT, bsType=BSType.BUY)
+        self.exchange.on_order(resting)
+        self.exchange.on_order(self.order_buy)
+        self.exchange.on_order(self.order_sell)
+        pack = self.exchange._get_pack('300667.XSHE')
+        self.assertEqual([order.orderID for order in pack.crossing(self.tick)], [0, 1])
+        trades = list(self.exchange.on_tick(self.tick))
+        self.assertEqual([trade.orderID for trade in trades], [0, 0, 0, 1, 1, 1])
+        self.assertEqual([order.orderID for order in pack], [2, 1])
+
+    def test_crossing_close(self):
+        orders = [Order(orderID=i, code='300667.XSHE', qty=100000, price=46.42,
+                        orderType=OrderType.LIMIT, bsType=BSType.BUY) for i in range(3)]
+        for order in orders:
+            self.exchange.on_order(order)
+        ticks = self.exchange.on_tick(self.tick)
+        next(ticks)
+        ticks.close()
+        pack = self.exchange._get_pack('300667.XSHE')
+        self.assertEqual([order.orderID for order in pack], [0, 1, 2])
+
+    def test_cancel(self):
+        self.exchange.on_order(self.order_buy)
+        self.exchange.on_order(self.order_sell)
+        self.assertIs(self.exchange.on_cancel(CancelOrder(orderID=0)), self.order_buy)
+        self.assertIsNone(self.exchange.on_cancel(CancelOrder(orderID=0)))
+        pack = self.exchange._get_pack('300667.XSHE')
+        self.assertEqual(len(pack), 1)
+        trades = list(self.exchange.on_tick(self.tick))
+        self.assertEqual({trade.orderID for trade in trades}, {1})
+        self.assertEqual(self.order_buy.unfilled, 4000)
+
+    def test_compact(self):
+        pack = self.exchange._get_pack('300667.XSHE')
+        for i in range(pack.COMPACT + 1):
+            self.exchange.on_order(Order(orderID=i, code='300667.XSHE', qty=100, price=40 + i % 3,
+                                         orderType=OrderType.LIMIT, bsType=BSType.BUY))
+        for i in range(pack.COMPACT):
+            self.exchange.on_cancel(CancelOrder(orderID=i))
+        self.assertEqual([order.orderID for order in pack], [pack.COMPACT])
+        self.assertEqual(len(pack._buy), 1)
+        self.assertEqual(len(pack._dead), 0)
+
+    def test_shared(self):
+        self.exchange = ExchangeCore(transactor=SharedTransactor())
+        first = Order(orderID=0, code='300667.XSHE', qty=4000, price=46.42,
+                      orderType=OrderType.LIMIT, bsType=BSType.BUY)
+        second = Order(orderID=2, code='300667.XSHE', qty=4000, price=46.42,
+                       orderType=OrderType.LIMIT, bsType=BSType.BUY)
+        self.exchange.on_order(first)
+        self.exchange.on_order(second)
+        self.exchange.on_order(self.order_sell)
+        trades = list(self.exchange.on_tick(self.tick))
+        self.assertEqual([(t.orderID, t.price, t.qty) for t in trades if t.orderID != 1],
+                         [(0, 46.4, 2600), (0, 46.41, 600), (0, 46.42, 800), (2, 46.42, 500)])
+        self.assertEqual(first.unfilled, 0)
+        self.assertEqual(second.unfilled, 3500)
+        self.assertEqual(self.order_sell.unfilled, 400)
+        self.assertEqual(list(self.exchange.transactor._ask), [0, 0, 0, 2900, 200])
+
+    def test_timestamp(self):
+        self.exchange.on_order(self.order_buy)
+        times = [trade.time for trade in self.exchange.on_tick(self.tick)]
+        self.assertEqual(times[0], combine(20171018, 94109000))
+        self.assertTrue(all(t is times[0] for t in times))
+
+        self.exchange = ExchangeCore(transactor=Transactor(timestamp=epoch_ms))
+        self.exchange.on_order(self.order_sell)
+        times = {trade.time for trade in self.exchange.on_tick(self.tick)}
+        self.assertEqual(times, {1508319669000})
+
+        calls = []
+        transactor = Transactor(timestamp=lambda date, time: calls.append(time) or time)
+        self.exchange = ExchangeCore(transactor=transactor)
+        self.assertEqual(list(self.exchange.on_tick(self.tick)), [])
+        self.assertEqual(calls, [])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
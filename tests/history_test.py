@@ -0,0 +1,97 @@
+import unittest
+from dayuex.server.core.history import TradeHistory
+from dayuex.server.core.account import Account
+from dayuex.module import storage, request, enums
+from datetime import datetime
+import struct
+
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.history = TradeHistory(3)
+        for i, code in enumerate(["A", "B", "A", "C", "A"]):
+            self.history.append(storage.Trade(3, i // 2, i, code, 100 * (i + 1), 1000 + i,
+                                              bsType=enums.BSType.SELL, time=datetime(2017, 10, 18, 9, 30, i)))
+
+    def test_indexes(self):
+        self.assertEqual([t.tradeID for t in self.history[1]], [2, 3])
+        self.assertEqual([t.tradeID for t in self.history.by_code("A")], [0, 2, 4])
+        trade = self.history[2][0]
+        self.assertEqual((trade.accountID, trade.code, trade.qty, trade.price, trade.bsType),
+                         (3, "A", 500, 1004, enums.BSType.SELL))
+        self.assertEqual(trade.time, datetime(2017, 10, 18, 9, 30, 4))
+        self.assertNotIn(5, self.history)
+        self.assertEqual(self.history.by_code("D"), [])
+
+    def test_between(self):
+        start = datetime(2017, 10, 18, 9, 30, 1)
+        end = datetime(2017, 10, 18, 9, 30, 4)
+        self.assertEqual([t.tradeID for t in self.history.between(start, end)], [1, 2, 3])
+        self.assertEqual([t.tradeID for t in self.history.between(start, code="A")], [2, 4])
+        self.history.append(storage.Trade(3, 9, 9, "A", 100, 1000, time=datetime(2017, 10, 18, 9, 30, 2)))
+        self.assertEqual([t.tradeID for t in self.history.between(start, end)], [1, 2, 3, 9])
+
+    def test_account(self):
+        account = Account(1, storage.Cash(1, 10**9))
+        order = account.on_req_order(request.ReqOrder(1, "000002", 1000, 105000, enums.OrderType.LIMIT,
+                                                      enums.BSType.BUY, datetime(2017, 10, 18, 9, 30)))
+        for i, qty in enumerate([400, 600]):
+            account.on_trade(storage.Trade(1, order.orderID, i, "000002", qty, 104000))
+        self.assertNotIn(order.orderID, account._orders)
+        archived = account.on_qry_order(request.QryOrder(1, order.orderID))
+        self.assertEqual((archived.cumQty, archived.orderStatus), (1000, enums.OrderStatus.FILLED))
+        trades = account.on_qry_trade(request.QryTrade(1, order.orderID))
+        self.assertEqual([t.qty for t in trades], [400, 600])
+
+    def test_float_price(self):
+        account = Account(1, storage.Cash(1, 10**9))
+        order = account.on_req_order(request.ReqOrder(1, "000002", 100, 105000, enums.OrderType.LIMIT,
+                                                      enums.BSType.BUY, datetime(2017, 10, 18, 9, 30)))
+        self.assertTrue(account.on_trade(storage.Trade(1, order.orderID, 1, "000002", 100, 104000.4)))
+        self.assertEqual(account._cash.frozen, 0)
+        self.assertEqual(account._history[order.orderID].cumQty, 100)
+        trade, = account.on_qry_trade(request.QryTrade(1, order.orderID))
+        self.assertEqual((trade.price, trade.orderType), (104000.4, enums.OrderType.LIMIT))
+        self.assertEqual(account._history[order.orderID].price, 105000)
+
+    def test_coerce(self):
+        history = TradeHistory(3)
+        trade = storage.Trade(3, 1, 1, "A", 100.0, 1000, bsType=enums.BSType.BUY, time=1)
+        trade.orderStatus = enums.OrderStatus.FILLED.value
+        history.append(trade)
+        with self.assertRaises(struct.error):
+            history.append(storage.Trade(3, 1, 2, "A", 100.5, 1000, time=2))
+        self.assertEqual(len(history), 1)
+        trade, = history[1]
+        self.assertEqual((trade.qty, trade.price, trade.orderStatus), (100, 1000, enums.OrderStatus.FILLED))
+
+    def test_limit(self):
+        history = TradeHistory(3, limit=2)
+        for i in range(7):
+            history.append(storage.Trade(3, i % 2, i, "AB"[i % 2], 100, 1000, time=i))
+        self.assertEqual(len(history), 3)
+        self.assertEqual([t.tradeID for t in history.between()], [4, 5, 6])
+        self.assertEqual([t.tradeID for t in history[0]], [4, 6])
+        self.assertEqual([t.tradeID for t in history.by_code("B")], [5])
+        self.assertNotIn(3, [t.tradeID for t in history.by_code("B")])
+
+    def test_evict(self):
+        account = Account(1, storage.Cash(1, 10**6), retain=2)
+        orders = [account.on_req_order(request.ReqOrder(1, "000002", 100, 1000 + i, enums.OrderType.LIMIT,
+                                                        enums.BSType.BUY, i)) for i in range(5)]
+        rejected = account.on_req_order(request.ReqOrder(1, "000002", 10**6, 1000, enums.OrderType.LIMIT,
+                                                         enums.BSType.BUY, 5))
+        self.assertEqual(account._history[rejected.orderID].reason, enums.CanceledReason.CASH)
+        for order in orders[:4]:
+            account.on_cancel(request.CancelOrder(1, order.orderID))
+        self.assertEqual(list(account._orders), [orders[4].orderID])
+        self.assertEqual(account._cash.frozen, 100 * 1004)
+        self.assertEqual(len(account._history), 3)
+        self.assertNotIn(orders[0].orderID, account._history)
+        archived = account.on_qry_order(request.QryOrder(1, orders[3].orderID))
+        self.assertEqual((archived.canceled, archived.orderStatus), (100, enums.OrderStatus.CANCELED))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+from dayuex.server.core.exchange import ExchangeCore, Transactor, SharedTransactor
+from dayuex.server.core.shard import ShardedExchange
+from dayuex.server.core.account import Account
+from dayuex.server.core.engine import Engine
+from dayuex.server.core.ids import BlockIDGenerator
+from dayuex.module import storage, request, enums
+
+
+TICK = {'date': 20171018, 'code': 'A', 'time': 93000000,
+        'ask': [[1000, 300], [1010, 500], [1020, 800]], 'bid': [[990, 400], [980, 600]]}
+
+
+class TestImmediate(unittest.TestCase):
+
+    def order(self, qty, price, order_type, bs_type=enums.BSType.BUY, orderID=1, frzAmt=0):
+        return storage.Order(1, orderID, "A", qty, price=price, orderType=order_type, bsType=bs_type,
+                             frzAmt=frzAmt)
+
+    def exchange(self, transactor=Transactor):
+        exchange = ExchangeCore(transactor=transactor(BlockIDGenerator(clock=None)))
+        list(exchange.on_tick(TICK))
+        return exchange
+
+    def test_exchange(self):
+        exchange = self.exchange()
+        trades = exchange.on_order(self.order(1000, 1010, enums.OrderType.IOC))
+        self.assertEqual([(t.qty, t.price) for t in trades], [(300, 1000), (500, 1010)])
+        self.assertEqual(exchange.on_order(self.order(1000, 1010, enums.OrderType.FOK)), [])
+        trades = exchange.on_order(self.order(700, 1010, enums.OrderType.FOK, enums.BSType.BUY))
+        self.assertEqual(sum(t.qty for t in trades), 700)
+        trades = exchange.on_order(self.order(2000, 0, enums.OrderType.MARKET, frzAmt=1000 * 300 + 1010 * 100))
+        self.assertEqual([(t.qty, t.price) for t in trades], [(300, 1000), (100, 1010)])
+        trades = exchange.on_order(self.order(2000, 0, enums.OrderType.MARKET, enums.BSType.SELL))
+        self.assertEqual([(t.qty, t.price) for t in trades], [(400, 990), (600, 980)])
+        trades = exchange.on_order(self.order(2000, 1000, enums.OrderType.MARKET, frzAmt=10**7))
+        self.assertEqual([(t.qty, t.price) for t in trades], [(300, 1000)])
+        self.assertEqual(exchange.reference_price("A", enums.BSType.BUY, 500), 1010)
+        self.assertEqual(exchange.reference_price("A", enums.BSType.SELL, 2000), 980)
+        self.assertIsNone(exchange.reference_price("B", enums.BSType.BUY, 100))
+        self.assertEqual(len(exchange._index), 0)
+        self.assertEqual(len(exchange._get_pack("A")), 0)
+        self.assertEqual(ExchangeCore().on_order(self.order(100, 1010, enums.OrderType.IOC)), [])
+
+    def test_unfilled(self):
+        exchange = self.exchange()
+        ioc = self.order(2000, 1010, enums.OrderType.IOC)
+        exchange.on_order(ioc)
+        self.assertEqual((ioc.qty, ioc.cumQty, ioc.unfilled, ioc.price), (2000, 800, 1200, 1010))
+        market = self.order(2000, 0, enums.OrderType.MARKET, enums.BSType.SELL)
+        exchange.on_order(market)
+        self.assertEqual((market.qty, market.unfilled, market.price), (2000, 1000, 0))
+
+    def test_shared(self):
+        exchange = self.exchange(SharedTransactor)
+        exchange.on_order(self.order(200, 1000, enums.OrderType.LIMIT, orderID=1))
+        list(exchange.on_tick(TICK))
+        trades = exchange.on_order(self.order(1000, 1010, enums.OrderType.IOC, orderID=2))
+        self.assertEqual([(t.qty, t.price) for t in trades], [(100, 1000), (500, 1010)])
+
+        exchange.on_order(self.order(1000, 1020, enums.OrderType.LIMIT, orderID=3))
+        list(exchange.on_tick(TICK))
+        list(exchange.on_tick(dict(TICK, code="B")))
+        trades = exchange.on_order(self.order(1000, 1020, enums.OrderType.IOC, orderID=4))
+        self.assertEqual([(t.qty, t.price) for t in trades], [(600, 1020)])
+
+    def test_clear(self):
+        exchange = self.exchange()
+        exchange.clear()
+        self.assertEqual(exchange.on_order(self.order(100, 1010, enums.OrderType.IOC)), [])
+
+    def test_engine(self):
+        account = Account(1, storage.Cash(1, 10**7), {"A": storage.Position(1, "A", 1000, 1000)},
+                          buy_rate=0.001)
+        engine = Engine([account])
+        list(engine.on_tick(TICK))
+        market = engine.on_request(request.ReqOrder(1, "A", 2000, 0, enums.OrderType.MARKET, enums.BSType.BUY))
+        self.assertEqual((market.price, market.cumQty), (1020, 300 + 500 + 800))
+        self.assertEqual((market.canceled, market.reason), (400, enums.CanceledReason.EXPIRED))
+        self.assertEqual([t.qty for t in engine.fills], [300, 500, 800])
+        cost = 1000 * 300 + 1010 * 500 + 1020 * 800
+        self.assertEqual(account._cash.frozen, 0)
+        self.assertEqual(account._cash.available, 10**7 - cost - sum(t.fee for t in engine.fills))
+
+        sell = engine.on_request(request.ReqOrder(1, "A", 1000, 985, enums.OrderType.IOC, enums.BSType.SELL))
+        self.assertEqual((sell.cumQty, sell.canceled), (400, 600))
+        position = account._positions["A"]
+        self.assertEqual((position.available, position.frozen, position.todaySell), (600, 0, 400))
+        self.assertEqual(account._orders, {})
+
+    def test_sharded(self):
+        with ShardedExchange(2, ids=BlockIDGenerator(clock=None)) as exchange:
+            exchange.put(TICK)
+            exchange.on_order(self.order(1000, 1010, enums.OrderType.IOC))
+            trades = exchange.flush()
+        self.assertEqual([(t.qty, t.price) for t in trades], [(300, 1000), (500, 1010)])
+
+
+if __name__ == '__main__':
+    unittest.main()
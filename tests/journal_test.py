@@ -0,0 +1,122 @@
+import unittest
+import tempfile
+import os
+from dayuex.server._io.journal import Journal, replay, RECORD
+from dayuex.server._io.snapshot import restore, offset
+from dayuex.server.core.account import Account
+from dayuex.server.core.manager import AccountManager
+from dayuex.server.core.settlement import Settlement
+from dayuex.module import storage, request, enums
+from datetime import datetime
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "journal.bin")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def run_session(self):
+        journal = Journal(self.path, group=4)
+        manager = AccountManager(journal=journal)
+        for i in (1, 2):
+            manager.add(Account(i, storage.Cash(i, 10**9), {"000001": storage.Position(i, "000001", 1000, 1000)},
+                                buy_rate=0.0005, sell_rate=0.0005))
+        now = datetime(2017, 10, 18, 9, 30)
+        buy, sell, rest = manager.on_requests([
+            request.ReqOrder(1, "000002", 1000, 105000, enums.OrderType.LIMIT, enums.BSType.BUY, now),
+            request.ReqOrder(2, "000001", 700, 203400, enums.OrderType.LIMIT, enums.BSType.SELL, now),
+            request.ReqOrder(2, "000001", 300, 203500, enums.OrderType.LIMIT, enums.BSType.SELL, now),
+        ])
+        manager.on_trades([
+            storage.Trade(1, buy.orderID, 1, "000002", 400, 104000, bsType=enums.BSType.BUY, time=now),
+            storage.Trade(2, sell.orderID, 2, "000001", 700, 203400, bsType=enums.BSType.SELL, time=now),
+        ])
+        manager.on_request(request.CancelOrder(1, buy.orderID))
+        journal.close()
+        return manager
+
+    def state(self, account):
+        return (
+            (account._cash.available, account._cash.frozen),
+            sorted((p.code, p.origin, p.available, p.frozen, p.today, p.todaySell)
+                   for p in account._positions.values()),
+            sorted((o.orderID, o.cumQty, o.cumAmt, o.cumFee, o.canceled, o.orderStatus.value)
+                   for o in account._orders.values()),
+        )
+
+    def test_replay(self):
+        manager = self.run_session()
+        accounts = replay(self.path)
+        self.assertEqual(sorted(accounts), [1, 2])
+        for accountID, account in accounts.items():
+            self.assertEqual(self.state(account), self.state(manager[accountID]))
+            self.assertEqual(account.br, 0.0005)
+        last = max(manager[2]._orders)
+        self.assertGreater(accounts[2]._id.next(), last)
+
+    def test_torn_tail(self):
+        self.run_session()
+        size = os.path.getsize(self.path)
+        self.assertEqual(size % RECORD.size, 0)
+        with open(self.path, "ab") as f:
+            f.write(b"\1" * (RECORD.size // 2))
+        accounts = replay(self.path)
+        self.assertEqual(sorted(accounts), [1, 2])
+
+    def test_snapshot_tail(self):
+        journal = Journal(self.path, group=4)
+        manager = AccountManager(journal=journal)
+        manager.add(Account(1, storage.Cash(1, 10**9), buy_rate=0.0005, sell_rate=0.0005))
+        now = datetime(2017, 10, 18, 9, 30)
+        first = manager.on_request(
+            request.ReqOrder(1, "000002", 1000, 105000, enums.OrderType.LIMIT, enums.BSType.BUY, now))
+        manager.on_trade(storage.Trade(1, first.orderID, 1, "000002", 400, 104000, bsType=enums.BSType.BUY))
+        data = manager.on_request(request.Snapshot(1))
+        self.assertEqual(offset(data), journal.offset)
+
+        second = manager.on_request(
+            request.ReqOrder(1, "000003", 500, 105000, enums.OrderType.LIMIT, enums.BSType.BUY, now))
+        manager.on_trade(storage.Trade(1, first.orderID, 2, "000002", 600, 105000, bsType=enums.BSType.BUY))
+        manager.on_request(request.CancelOrder(1, second.orderID))
+        journal.close()
+
+        accounts = replay(self.path, {1: restore(data)}, start=offset(data))
+        self.assertEqual(self.state(accounts[1]), self.state(manager[1]))
+        self.assertEqual(accounts[1]._cash.frozen, 0)
+
+    def test_day_off(self):
+        journal = Journal(self.path, group=4)
+        manager = AccountManager([Account(1, storage.Cash(1, 10**9))], journal)
+        buy = manager.on_request(request.ReqOrder(1, "000002", 100, 1000, enums.OrderType.LIMIT, enums.BSType.BUY, 0))
+        rest = manager.on_request(request.ReqOrder(1, "000002", 100, 900, enums.OrderType.LIMIT, enums.BSType.BUY, 0))
+        manager.on_trade(storage.Trade(1, buy.orderID, 1, "000002", 100, 1000, bsType=enums.BSType.BUY))
+        Settlement(manager).run({"000002": 1000})
+        sell = manager.on_request(
+            request.ReqOrder(1, "000002", 100, 1000, enums.OrderType.LIMIT, enums.BSType.SELL, 1))
+        manager.on_trade(storage.Trade(1, sell.orderID, 2, "000002", 100, 1000, bsType=enums.BSType.SELL))
+        journal.close()
+
+        account = replay(self.path)[1]
+        self.assertEqual(self.state(account), self.state(manager[1]))
+        self.assertEqual((account._cash.available, account._positions["000002"].available), (10**9, 0))
+        self.assertEqual(account._history[rest.orderID].reason, enums.CanceledReason.EXPIRED)
+
+    def test_commit_due(self):
+        journal = Journal(self.path, interval=60)
+        manager = AccountManager(journal=journal)
+        manager.add(Account(1, storage.Cash(1, 10**9)))
+        self.assertFalse(journal.commit_due())
+        self.assertEqual(os.path.getsize(self.path), 0)
+        journal.interval = 0
+        self.assertTrue(journal.commit_due())
+        self.assertEqual(os.path.getsize(self.path), journal.offset * RECORD.size)
+        self.assertFalse(journal.commit_due())
+        journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
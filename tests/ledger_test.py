@@ -0,0 +1,60 @@
+import unittest
+from dayuex.server.core.ledger import PositionLedger, CashLedger
+from dayuex.server.core.account import Account
+from dayuex.module import storage, request, enums
+
+
+class TestLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.ledger = PositionLedger()
+        self.ledger.put(storage.Position(1, "A", 1000, 1000))
+        self.ledger.put(storage.Position(2, "A", 500, 500))
+
+    def test_slots(self):
+        slot = self.ledger.slot(1, "A")
+        self.assertEqual(self.ledger.slot(1, "A"), slot)
+        self.assertNotEqual(self.ledger.slot(2, "A"), slot)
+        self.ledger.freeze(slot, 300)
+        self.ledger.sub(slot, 200)
+        self.ledger.unfreeze(slot, 100)
+        self.ledger.add(slot, 50)
+        position = self.ledger.get(1, "A")
+        self.assertEqual((position.available, position.frozen, position.today, position.todaySell),
+                         (800, 0, 50, 200))
+        with self.assertRaises(storage.PositionFreezeExceed):
+            self.ledger.freeze(slot, 801)
+        with self.assertRaises(storage.PositionSubExceed):
+            self.ledger.sub(slot, 1)
+        self.assertIsNone(self.ledger.get(3, "A"))
+
+    def test_day_off(self):
+        view = self.ledger.get(1, "A")
+        view.freeze(300)
+        view.add(100)
+        self.ledger.day_off()
+        expected = storage.Position(1, "A", 1000, 1000)
+        expected.freeze(300)
+        expected.add(100)
+        expected.day_off()
+        self.assertEqual(str(view), str(expected))
+        self.assertEqual(self.ledger.get(2, "A").origin, 500)
+
+    def test_account(self):
+        cash = CashLedger()
+        cash.put(storage.Cash(1, 10**7))
+        account = Account(1, cash.cash(1), self.ledger.positions(1))
+        sell = account.on_req_order(request.ReqOrder(1, "A", 700, 1000, enums.OrderType.LIMIT, enums.BSType.SELL))
+        buy = account.on_req_order(request.ReqOrder(1, "B", 100, 1000, enums.OrderType.LIMIT, enums.BSType.BUY))
+        account.on_trade(storage.Trade(1, sell.orderID, 1, "A", 700, 1000))
+        account.on_trade(storage.Trade(1, buy.orderID, 2, "B", 100, 1000))
+        self.assertEqual(self.ledger.get(1, "A").todaySell, 700)
+        self.assertEqual(self.ledger.get(1, "B").today, 100)
+        self.assertEqual(cash.available[cash.slot(1)], 10**7 + 600 * 1000)
+        self.assertEqual(sorted(account._positions), ["A", "B"])
+        with self.assertRaises(storage.CashSubExceed):
+            cash.sub(cash.slot(1), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from dayuex.server.core.account import Account
+from dayuex.server.core.manager import AccountManager
+from dayuex.module import storage, request, enums
+from datetime import datetime
+
+
+class TestAccountManager(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = AccountManager(
+            Account(i, storage.Cash(i, 10**8), {"000001": storage.Position(i, "000001", 1000, 1000)})
+            for i in (1, 2)
+        )
+
+    def req(self, accountID, bsType):
+        return request.ReqOrder(accountID, "000001", 500, 10**4, enums.OrderType.LIMIT, bsType, datetime.now())
+
+    def test_requests(self):
+        orders = self.manager.on_requests([
+            self.req(1, enums.BSType.BUY), self.req(1, enums.BSType.SELL),
+            self.req(2, enums.BSType.SELL), self.req(3, enums.BSType.BUY),
+        ])
+        self.assertEqual([order.accountID for order in orders], [1, 1, 2, 3])
+        self.assertEqual(orders[-1].reason, enums.CanceledReason.MISSING)
+        self.assertEqual(self.manager[1]._cash.frozen, orders[0].frzAmt)
+        self.assertEqual(self.manager[2]._positions["000001"].frozen, 500)
+
+        results = self.manager.on_requests([
+            request.QryCash(1), request.CancelOrder(2, orders[2].orderID), request.QryOrder(1, 30)
+        ])
+        self.assertIs(results[0], self.manager[1]._cash)
+        self.assertEqual(results[1].reason, enums.CanceledReason.CLIENT)
+        self.assertIsNone(results[2])
+        self.assertEqual(self.manager.on_request(request.QryCash(3)), None)
+
+        results = self.manager.on_requests([request.QryCash(1), storage.Cash(1), request.QryCash(1)])
+        self.assertEqual(results, [self.manager[1]._cash, None, self.manager[1]._cash])
+        self.assertEqual(self.manager.on_requests([
+            request.QryPosition(1, "000009"), request.QryTrade(1, 30), request.QryOrder(1, 30)
+        ]), [None, None, None])
+
+        def broken(qry):
+            raise KeyError(qry.accountID)
+
+        self.manager[1].on_qry_cash = broken
+        with self.assertRaises(KeyError):
+            self.manager.on_request(request.QryCash(1))
+        with self.assertRaises(KeyError):
+            self.manager.on_requests([request.QryCash(1)])
+
+    def test_trades(self):
+        buy = self.manager.on_request(self.req(1, enums.BSType.BUY))
+        sell = self.manager.on_request(self.req(2, enums.BSType.SELL))
+        trades = [
+            storage.Trade(1, buy.orderID, 1, "000001", 500, 10**4, bsType=enums.BSType.BUY),
+            storage.Trade(2, sell.orderID, 2, "000001", 500, 10**4, bsType=enums.BSType.SELL),
+            storage.Trade(3, 0, 3, "000001", 500, 10**4, bsType=enums.BSType.SELL),
+        ]
+        self.assertEqual(self.manager.on_trades(trades), [True, True, False])
+        self.assertEqual(buy.orderStatus, enums.OrderStatus.FILLED)
+        self.assertEqual(self.manager[2]._positions["000001"].todaySell, 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from dayuex.server.core.metrics import Histogram, Metrics, instrument, uninstrument
+from dayuex.server.core.account import Account
+from dayuex.server.core.engine import Engine
+from dayuex.server.core.exchange import ExchangeCore
+from dayuex.module import storage, request, enums
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram(self):
+        histogram = Histogram(sub_bits=4)
+        for value in range(1, 10001):
+            histogram.record(value)
+        self.assertEqual(histogram.count, 10000)
+        for q in (0.5, 0.9, 0.99):
+            self.assertLess(abs(histogram.percentile(q) - q * 10000) / (q * 10000), 1 / 16)
+        self.assertEqual(histogram.snapshot()["max"], 10000)
+        histogram.record(2**50)
+        self.assertEqual(histogram.percentile(1), 2**50)
+        histogram.reset()
+        self.assertEqual(histogram.snapshot()["count"], 0)
+
+    def test_instrument(self):
+        metrics = Metrics()
+        account = instrument(Account(1, storage.Cash(1, 10**9)), metrics)
+        engine = Engine([account], instrument(ExchangeCore(), metrics, per_code=True))
+        orders = [engine.on_request(request.ReqOrder(1, "A", 100, 1000 + i, enums.OrderType.LIMIT,
+                                                     enums.BSType.BUY, 0)) for i in range(3)]
+        engine.on_request(request.CancelOrder(1, orders[0].orderID))
+        tick = {"date": 20171018, "time": 93000000, "code": "A", "ask": [[1001, 100]], "bid": [[990, 100]]}
+        trades = list(engine.on_tick(tick))
+        self.assertEqual(len(trades), 2)
+
+        snapshot = metrics.snapshot(reset=True)
+        histograms = snapshot["histograms"]
+        self.assertEqual(histograms["account.order"]["count"], 3)
+        self.assertEqual(histograms["exchange.order"]["count"], 3)
+        self.assertEqual(histograms["account.cancel"]["count"], 1)
+        self.assertEqual(histograms["account.trade"]["count"], 2)
+        self.assertEqual(histograms["exchange.tick.A"]["count"], 1)
+        self.assertEqual(snapshot["counters"], {"ticks": 1, "scanned": 2, "trades": 2})
+        self.assertEqual(metrics.snapshot()["counters"]["trades"], 0)
+
+        uninstrument(account)
+        uninstrument(engine.exchange)
+        self.assertNotIn("on_trade", vars(account))
+        self.assertNotIn("on_tick", vars(engine.exchange))
+        list(engine.on_tick(tick))
+        self.assertEqual(metrics.snapshot()["counters"]["ticks"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import asyncio
+from dayuex.server.net import Server, Connection
+from dayuex.module.wire import frames, RESPONSE
+from dayuex.server.core.engine import Engine
+from dayuex.server.core.account import Account
+from dayuex.server.core.manager import AccountManager
+from dayuex.server.core.throttle import Throttle
+from dayuex.client.client import Client
+from dayuex.module import storage, request, enums
+from datetime import datetime
+
+
+class TestNetwork(unittest.TestCase):
+
+    def setUp(self):
+        self.id = 9
+        self.account = Account(self.id, storage.Cash(self.id, 10**10))
+        self.tick = {'date': 20171018, 'code': '300667.XSHE', 'time': 94109000,
+                     'ask': [[464000, 2600], [464100, 600]], 'bid': [[463900, 200]]}
+
+    async def session(self):
+        server = Server(Engine([self.account]))
+        await server.start()
+        client = await Client.connect(port=server.port)
+        other = await Client.connect(port=server.port)
+        try:
+            req = request.ReqOrder(self.id, "300667.XSHE", 3000, 464100, enums.OrderType.LIMIT,
+                                   enums.BSType.BUY, datetime(2017, 10, 18, 9, 41))
+            order, cash, missing, canceled = await client.requests([
+                req, request.QryCash(self.id), request.QryOrder(self.id, 1), request.CancelOrder(self.id, 12345)
+            ])
+            self.assertEqual(canceled.reason, enums.CanceledReason.MISSING)
+            server.on_tick(self.tick)
+            trades = [await asyncio.wait_for(client.updates.get(), 1) for i in range(2)]
+            self.assertTrue(other.updates.empty())
+            queried = await client.request(request.QryTrade(self.id, order.orderID))
+            self.assertEqual([(t.tradeID, t.qty) for t in queried], [(t.tradeID, t.qty) for t in trades])
+            return order, cash, missing, trades
+        finally:
+            await client.close()
+            await other.close()
+            await server.close()
+
+    def test_session(self):
+        order, cash, missing, trades = asyncio.run(self.session())
+        self.assertEqual(order.__class__, storage.Order)
+        self.assertEqual(order.bsType, enums.BSType.BUY)
+        self.assertEqual(order.time, datetime(2017, 10, 18, 9, 41))
+        self.assertEqual(cash.frozen, order.frzAmt + order.frzFee)
+        self.assertIsNone(missing)
+        self.assertEqual([(t.orderID, t.qty, t.price) for t in trades],
+                         [(order.orderID, 2600, 464000), (order.orderID, 400, 464100)])
+        self.assertEqual(self.account._history[order.orderID].orderStatus, enums.OrderStatus.FILLED)
+
+    async def throttled(self):
+        manager = AccountManager([self.account], throttle=Throttle(100, burst=1, delay=1))
+        server = Server(Engine(manager))
+        await server.start()
+        client = await Client.connect(port=server.port)
+        try:
+            req = request.ReqOrder(self.id, "300667.XSHE", 100, 464100, enums.OrderType.LIMIT,
+                                   enums.BSType.BUY, datetime(2017, 10, 18, 9, 41))
+            results = await client.requests([req, req])
+            return results, await asyncio.wait_for(client.updates.get(), 1)
+        finally:
+            await client.close()
+            await server.close()
+
+    def test_throttled(self):
+        (first, queued), drained = asyncio.run(self.throttled())
+        self.assertIsNone(queued)
+        self.assertEqual(drained.__class__, storage.Order)
+        self.assertEqual(len(self.account._orders), 2)
+
+    async def immediate(self):
+        engine = Engine([self.account])
+        server = Server(engine)
+        await server.start()
+        client = await Client.connect(port=server.port)
+        try:
+            server.on_tick(self.tick)
+            order = await client.request(request.ReqOrder(self.id, "300667.XSHE", 3000, 464000, enums.OrderType.IOC,
+                                                          enums.BSType.BUY, datetime(2017, 10, 18, 9, 41)))
+            return order, await asyncio.wait_for(client.updates.get(), 1), engine.fills
+        finally:
+            await client.close()
+            await server.close()
+
+    def test_immediate(self):
+        order, trade, fills = asyncio.run(self.immediate())
+        self.assertEqual((order.cumQty, order.canceled), (2600, 400))
+        self.assertEqual((trade.orderID, trade.qty, trade.price), (order.orderID, 2600, 464000))
+        self.assertEqual(fills, [])
+
+    async def unencodable(self):
+        server = Server(Engine([self.account]))
+        await server.start()
+        client = await Client.connect(port=server.port)
+        try:
+            with self.assertRaises(KeyError):
+                client.send(object())
+            return await asyncio.wait_for(client.request(request.QryCash(self.id)), 1), len(client._pending)
+        finally:
+            await client.close()
+            await server.close()
+
+    def test_unencodable(self):
+        cash, pending = asyncio.run(self.unencodable())
+        self.assertEqual(cash.__class__, storage.Cash)
+        self.assertEqual(pending, 0)
+
+    async def unencodable_response(self):
+        connection = Connection(None)
+        with self.assertLogs(level="ERROR"):
+            connection.send(RESPONSE, storage.Order(self.id, price=464000.5))
+        connection.send(RESPONSE, storage.Order(self.id, price=464000))
+        return frames(connection._out)
+
+    def test_unencodable_response(self):
+        (first, none), (second, order) = asyncio.run(self.unencodable_response())
+        self.assertEqual((first, second), (RESPONSE, RESPONSE))
+        self.assertIsNone(none)
+        self.assertEqual(order.price, 464000)
+
+
+if __name__ == '__main__':
+    unittest.main()
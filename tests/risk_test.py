@@ -0,0 +1,80 @@
+import unittest
+from dayuex.server.core.risk import Risk, Firm
+from dayuex.server.core.account import Account
+from dayuex.server.core.engine import Engine
+from dayuex.module import storage, request, enums
+
+
+class TestRisk(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.firm = Firm(exposure=10**6)
+        self.account = Account(1, storage.Cash(1, 10**9), {"A": storage.Position(1, "A", 1000, 1000)},
+                               risk=Risk(notional=500000, position=3000, exposure=600000, rate=3,
+                                         firm=self.firm, clock=lambda: self.now))
+
+    def order(self, code, qty, price, bs=enums.BSType.BUY):
+        self.now += 0.5
+        return self.account.on_req_order(request.ReqOrder(1, code, qty, price, enums.OrderType.LIMIT, bs))
+
+    def test_limits(self):
+        self.assertEqual(self.order("A", 1000, 600).reason, enums.CanceledReason.NOTIONAL)
+        self.assertEqual(self.order("A", 2500, 100).reason, enums.CanceledReason.POSITION_LIMIT)
+        first = self.order("A", 2000, 100)
+        self.assertEqual(first.reason, enums.CanceledReason.NONE)
+        self.assertEqual(self.order("B", 1000, 450).reason, enums.CanceledReason.EXPOSURE)
+        self.assertEqual(self.account.risk.exposure, 200000)
+        self.assertEqual(self.firm.exposure, 200000)
+        self.assertEqual(self.account._cash.frozen, 0 + first.frzAmt)
+
+        self.account.on_trade(storage.Trade(1, first.orderID, 1, "A", 1000, 90))
+        self.assertEqual(self.account.risk.exposure, 190000)
+        self.account.on_cancel(request.CancelOrder(1, first.orderID))
+        self.assertEqual(self.account.risk.exposure, 90000)
+        self.assertEqual(self.account.risk._long["A"], 2000)
+
+        sell = self.order("A", 500, 100, enums.BSType.SELL)
+        self.account.on_trade(storage.Trade(1, sell.orderID, 2, "A", 500, 100))
+        self.assertEqual(self.account.risk.exposure, 90000 - 90000 * 500 // 2000)
+        self.assertEqual(self.account.risk._long["A"], 1500)
+
+    def test_market(self):
+        market = request.ReqOrder(1, "A", 100, 0, enums.OrderType.MARKET, enums.BSType.BUY)
+        account = Account(1, storage.Cash(1, 10**5), risk=Risk(notional=2000, exposure=3000))
+        self.assertEqual(account.on_req_order(market).reason, enums.CanceledReason.PRICE)
+        collared = request.ReqOrder(1, "A", 100, 30, enums.OrderType.MARKET, enums.BSType.BUY)
+        self.assertEqual(account.on_req_order(collared).reason, enums.CanceledReason.NOTIONAL)
+        collared.price = 20
+        self.assertEqual(account.on_req_order(collared).orderStatus, enums.OrderStatus.UNFILLED)
+        self.assertEqual((account._cash.frozen, account.risk.exposure), (2000, 2000))
+        limit = request.ReqOrder(1, "B", 100, 10, enums.OrderType.LIMIT, enums.BSType.BUY)
+        self.assertEqual(account.on_req_order(limit).orderStatus, enums.OrderStatus.UNFILLED)
+
+        account = Account(1, storage.Cash(1, 10**6), risk=Risk(exposure=2 * 10**6))
+        engine = Engine([account])
+        self.assertEqual(engine.on_request(market).reason, enums.CanceledReason.PRICE)
+        list(engine.on_tick({'date': 20171018, 'code': 'A', 'time': 93000000,
+                             'ask': [[1000, 30], [1010, 50]], 'bid': [[990, 40]]}))
+        order = engine.on_request(market)
+        self.assertEqual((order.price, order.cumQty, order.canceled), (1010, 80, 20))
+        self.assertEqual(account._cash.frozen, 0)
+        self.assertEqual(account.risk.exposure, 1000 * 30 + 1010 * 50)
+        self.assertEqual(account.risk._long["A"], 80)
+
+    def test_rate(self):
+        reasons = []
+        for i in range(4):
+            self.now = 10 + i * 0.1
+            order = self.account.on_req_order(request.ReqOrder(1, "B", 100, 100, enums.OrderType.LIMIT,
+                                                               enums.BSType.BUY))
+            reasons.append(order.reason)
+        self.assertEqual(reasons, [enums.CanceledReason.NONE] * 3 + [enums.CanceledReason.RATE])
+        self.now = 11.05
+        self.assertEqual(self.account.on_req_order(request.ReqOrder(1, "B", 100, 100, enums.OrderType.LIMIT,
+                                                                    enums.BSType.BUY)).reason,
+                         enums.CanceledReason.NONE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from dayuex.server.core.settlement import Settlement
+from dayuex.server.core.ledger import PositionLedger
+from dayuex.server.core.account import Account
+from dayuex.server.core.engine import Engine
+from dayuex.module import storage, request, enums
+
+
+class TestSettlement(unittest.TestCase):
+
+    def accounts(self, ledger=None):
+        accounts = []
+        for i in (1, 2):
+            positions = {} if ledger is None else ledger.positions(i)
+            positions["A"] = storage.Position(i, "A", 1000, 1000)
+            accounts.append(Account(i, storage.Cash(i, 10**6), positions))
+        return accounts
+
+    def session(self, ledger=None):
+        engine = Engine(self.accounts(ledger))
+        manager = engine.accounts
+        engine.on_request(request.ReqOrder(1, "A", 600, 100, enums.OrderType.LIMIT, enums.BSType.SELL, 0))
+        engine.on_request(request.ReqOrder(2, "B", 100, 200, enums.OrderType.LIMIT, enums.BSType.BUY, 0))
+        engine.on_request(request.ReqOrder(2, "B", 300, 150, enums.OrderType.LIMIT, enums.BSType.BUY, 0))
+        tick = {"date": 20171018, "time": 93000000, "code": "B", "ask": [[200, 100]], "bid": [[190, 100]]}
+        list(engine.on_tick(tick))
+        settlement = Settlement(manager, engine.exchange, ledger)
+        return manager, engine.exchange, settlement
+
+    def check(self, ledger=None):
+        manager, exchange, settlement = self.session(ledger)
+        equity = settlement.run({"A": 110, "B": 210})
+        self.assertEqual(equity, {1: 10**6 + 1000 * 110, 2: 10**6 - 100 * 200 + 1000 * 110 + 100 * 210})
+        for account in manager:
+            self.assertEqual(account._orders, {})
+            self.assertEqual(account._cash.frozen, 0)
+        sell = manager[1]._history.by_code("A")[0]
+        self.assertEqual((sell.canceled, sell.reason), (600, enums.CanceledReason.EXPIRED))
+        self.assertEqual(exchange.clear(), 0)
+        position = manager[2]._positions["B"]
+        self.assertEqual((position.origin, position.available, position.today), (100, 100, 0))
+        self.assertEqual(manager[1]._positions["A"].available, 1000)
+
+        equity = settlement.run({"A": 100, "B": 220})
+        self.assertEqual(settlement.pnl, {1: -10000, 2: -10000 + 1000})
+
+    def test_accounts(self):
+        self.check()
+
+    def test_ledger(self):
+        ledger = PositionLedger()
+        ledger.put(storage.Position(3, "A", 5000, 5000))
+        self.check(ledger)
+
+
+if __name__ == '__main__':
+    unittest.main()
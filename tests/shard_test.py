@@ -0,0 +1,59 @@
+import unittest
+from dayuex.server.core.shard import ShardedExchange
+from dayuex.server.core.exchange import ExchangeCore, Transactor
+from dayuex.server.core.ids import BlockIDGenerator
+from dayuex.module.storage import Order
+from dayuex.module.request import CancelOrder
+from dayuex.module.enums import OrderType, BSType
+
+
+class TestShardedExchange(unittest.TestCase):
+
+    codes = ["000001.XSHE", "000002.XSHE", "600000.XSHG", "300667.XSHE"]
+
+    def ticks(self):
+        for i in range(20):
+            for j, code in enumerate(self.codes):
+                yield {'date': 20171018, 'code': code, 'time': 93000000 + i * 3000,
+                       'ask': [[10 + j + (i % 3) * 0.01, 300], [10.05 + j, 500]],
+                       'bid': [[9.99 + j - (i % 2) * 0.01, 400], [9.95 + j, 800]]}
+
+    def orders(self):
+        orders = []
+        for j, code in enumerate(self.codes):
+            for k in range(5):
+                orders.append(Order(orderID=len(orders), code=code, qty=1000, price=10 + j + k * 0.01,
+                                    orderType=OrderType.LIMIT, bsType=BSType.BUY))
+                orders.append(Order(orderID=len(orders), code=code, qty=1000, price=9.98 + j - k * 0.01,
+                                    orderType=OrderType.LIMIT, bsType=BSType.SELL))
+        return orders
+
+    def run_exchange(self, exchange, ticks):
+        for order in self.orders():
+            exchange.on_order(order)
+        exchange.on_cancel(CancelOrder(orderID=3))
+        return ticks(exchange)
+
+    def test_identical(self):
+        single = self.run_exchange(
+            ExchangeCore(transactor=Transactor(BlockIDGenerator(clock=None))),
+            lambda exchange: [trade for tick in self.ticks() for trade in exchange.on_tick(tick)]
+        )
+        with ShardedExchange(2, ids=BlockIDGenerator(clock=None)) as exchange:
+            sharded = self.run_exchange(exchange, lambda exchange: exchange.on_ticks(self.ticks()))
+        self.assertTrue(single)
+        self.assertEqual(
+            [(t.orderID, t.tradeID, t.code, t.price, t.qty, t.time) for t in sharded],
+            [(t.orderID, t.tradeID, t.code, t.price, t.qty, t.time) for t in single]
+        )
+
+    def test_clear(self):
+        with ShardedExchange(2) as exchange:
+            for order in self.orders():
+                exchange.on_order(order)
+            self.assertEqual(exchange.clear(), 40)
+            self.assertEqual(exchange.on_ticks(self.ticks()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
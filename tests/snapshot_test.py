@@ -0,0 +1,61 @@
+import unittest
+from dayuex.server._io.snapshot import restore, HEADER
+from dayuex.server.core.account import Account
+from dayuex.module import storage, request, enums
+from datetime import datetime
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.id = 1367
+        self.account = Account(
+            self.id, storage.Cash(self.id, 10**10),
+            {code: storage.Position(self.id, code, 1000, 1000) for code in ("000001", "000002", "000003")},
+            buy_rate=0.0005, sell_rate=0.0005
+        )
+
+    def req(self, code, qty, price, bsType):
+        return self.account.on_req_order(request.ReqOrder(
+            self.id, code, qty, price, enums.OrderType.LIMIT, bsType, datetime(2017, 10, 18, 9, 30)
+        ))
+
+    def state(self, account):
+        return (
+            (account._cash.available, account._cash.frozen, account.br, account.sr),
+            sorted((p.code, p.origin, p.available, p.frozen, p.today, p.todaySell)
+                   for p in account._positions.values()),
+            sorted((o.orderID, o.code, o.qty, o.cumQty, o.price, o.orderType, o.bsType, o.orderStatus,
+                    o.frzAmt, o.frzFee, o.cumAmt, o.cumFee, o.canceled, o.reason, o.time)
+                   for o in account._orders.values() if o.unfilled > 0),
+        )
+
+    def test_full(self):
+        buy = self.req("000004", 1000, 105000, enums.BSType.BUY)
+        self.req("000001", 300, 203400, enums.BSType.SELL)
+        self.account.on_trade(storage.Trade(self.id, buy.orderID, 1, "000004", 400, 104000,
+                                            bsType=enums.BSType.BUY))
+        copy = restore(self.account.on_snapshot(request.Snapshot(self.id)))
+        self.assertEqual(self.state(copy), self.state(self.account))
+        self.assertEqual(len(copy._orders), 2)
+
+    def test_incremental(self):
+        buy = self.req("000004", 1000, 105000, enums.BSType.BUY)
+        sell = self.req("000001", 300, 203400, enums.BSType.SELL)
+        copy = restore(self.account.on_snapshot())
+
+        self.account.on_trade(storage.Trade(self.id, buy.orderID, 1, "000004", 1000, 105000,
+                                            bsType=enums.BSType.BUY))
+        self.account.on_cancel(request.CancelOrder(self.id, sell.orderID))
+        self.req("000002", 200, 203400, enums.BSType.SELL)
+        data = self.account.on_snapshot(incremental=True)
+        self.assertEqual(HEADER.unpack_from(data)[-3:], (3, 1, 2))
+
+        restore(data, copy)
+        self.assertEqual(self.state(copy), self.state(self.account))
+        self.assertEqual(len(copy._orders), 1)
+        self.assertEqual(HEADER.unpack_from(self.account.on_snapshot(incremental=True))[-3:], (0, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
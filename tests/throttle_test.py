@@ -0,0 +1,79 @@
+import unittest
+from dayuex.server.core.throttle import Throttle
+from dayuex.server.core.manager import AccountManager
+from dayuex.server.core.account import Account
+from dayuex.server.core.engine import Engine
+from dayuex.module import storage, request, enums
+from datetime import datetime
+
+
+class TestThrottle(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+
+    def clock(self):
+        return self.now
+
+    def test_bucket(self):
+        throttle = Throttle(10, burst=2, clock=self.clock)
+        self.assertEqual([throttle.acquire(1), throttle.acquire(1), throttle.acquire(1)], [0, 0, None])
+        self.assertEqual(throttle.acquire(2), 0)
+        self.now = 0.1
+        self.assertEqual(throttle.acquire(1), 0)
+        self.assertIsNone(throttle.acquire(1))
+        self.now = 10
+        self.assertEqual([throttle.acquire(1), throttle.acquire(1), throttle.acquire(1)], [0, 0, None])
+
+    def test_delay(self):
+        throttle = Throttle(10, burst=1, delay=0.25, clock=self.clock)
+        waits = [throttle.acquire(1) for i in range(5)]
+        self.assertEqual(waits[0], 0)
+        self.assertAlmostEqual(waits[1], 0.1)
+        self.assertAlmostEqual(waits[2], 0.2)
+        self.assertEqual(waits[3:], [None, None])
+
+    def manager(self, **kwargs):
+        account = Account(1, storage.Cash(1, 10**9))
+        return AccountManager([account], throttle=Throttle(10, burst=1, clock=self.clock, **kwargs))
+
+    def req(self):
+        return request.ReqOrder(1, "A", 100, 1000, enums.OrderType.LIMIT, enums.BSType.BUY)
+
+    def test_reject(self):
+        manager = self.manager()
+        first, second, cash = manager.on_requests([self.req(), self.req(), request.QryCash(1)])
+        self.assertEqual(first.reason, enums.CanceledReason.NONE)
+        self.assertEqual((second.reason, second.canceled), (enums.CanceledReason.THROTTLE, 100))
+        self.assertEqual(cash.frozen, first.frzAmt)
+
+    def test_queue(self):
+        manager = self.manager(delay=1)
+        results = [manager.on_request(self.req()) for i in range(3)]
+        self.assertIsNone(results[1])
+        self.assertEqual(manager.queued, 2)
+        self.assertEqual(manager.drain(), [])
+        self.now = 0.15
+        drained = manager.drain()
+        self.assertEqual(len(drained), 1)
+        self.assertEqual(drained[0][1].reason, enums.CanceledReason.NONE)
+        self.now = 1
+        self.assertEqual(len(manager.drain()), 1)
+        self.assertEqual(len(manager[1]._orders), 3)
+
+    def test_engine(self):
+        manager = AccountManager([Account(1, storage.Cash(1, 10**10))], throttle=Throttle(1, burst=1, delay=10))
+        engine = Engine(manager)
+        ticks = [{'date': 20171018, 'code': 'A', 'time': time, 'ask': [[464000, 2600]], 'bid': [[463900, 200]]}
+                 for time in (94109000, 94112000)]
+        reqs = [request.ReqOrder(1, "A", 100, 464100, enums.OrderType.LIMIT, enums.BSType.BUY,
+                                 datetime(2017, 10, 18, 9, 41, second)) for second in (5, 5, 20, 20)]
+        events = list(engine.run(ticks, reqs))
+        self.assertEqual([event.__class__.__name__ for event in events],
+                         ["Order", "NoneType", "Order", "Trade", "Trade", "Order", "NoneType", "Order"])
+        self.assertEqual(manager.queued, 0)
+        self.assertEqual(len(manager[1]._orders), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import tempfile
+import json
+import os
+from dayuex.server._io.tickstore import TickReader, write, convert_json
+from dayuex.server.core.exchange import ExchangeCore, SharedTransactor
+from dayuex.module.storage import Order
+from dayuex.module.enums import BSType
+
+
+class TestTickStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "ticks.bin")
+        self.ticks = [
+            {'date': 20171018, 'code': '300667.XSHE', 'time': 94109000,
+             'ask': [[46.4, 2600], [46.41, 600], [46.42, 1300], [46.43, 2900], [46.44, 200]],
+             'bid': [[46.39, 200], [46.29, 1000], [46.28, 400], [46.2, 300], [46.19, 600]]},
+            {'date': 20171018, 'code': '000001.XSHE', 'time': 94109000,
+             'ask': [[11.2, 100]], 'bid': []},
+            {'date': 20171018, 'code': '300667.XSHE', 'time': 94112000,
+             'ask': [[46.41, 900], [46.42, 700]], 'bid': [[46.3, 500], [46.25, 1000]]},
+        ]
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def scaled(self, tick):
+        return dict(tick, ask=[[int(round(p * 100)), v] for p, v in tick['ask']],
+                    bid=[[int(round(p * 100)), v] for p, v in tick['bid']])
+
+    def orders(self):
+        return [Order(orderID=0, code='300667.XSHE', qty=4000, price=4642, bsType=BSType.BUY),
+                Order(orderID=1, code='300667.XSHE', qty=2000, price=4627, bsType=BSType.SELL),
+                Order(orderID=2, code='000001.XSHE', qty=100, price=1130, bsType=BSType.BUY)]
+
+    def trades(self, ticks, transactor=None):
+        exchange = ExchangeCore(transactor=transactor)
+        for order in self.orders():
+            exchange.on_order(order)
+        return [(t.orderID, int(t.price), int(t.qty), t.time) for tick in ticks for t in exchange.on_tick(tick)]
+
+    def test_replay(self):
+        self.assertEqual(write(self.path, self.ticks, depth=5, scale=100), 3)
+        reader = TickReader(self.path, chunk=2)
+        self.assertEqual(len(reader), 3)
+        views = list(reader)
+        self.assertEqual([view['code'] for view in views], ['300667.XSHE', '000001.XSHE', '300667.XSHE'])
+        self.assertEqual(views[1]['ask'].tolist()[:2], [[1120, 100], [2**63 - 1, 0]])
+        expected = self.trades([self.scaled(tick) for tick in self.ticks])
+        self.assertEqual(self.trades(views), expected)
+        self.assertEqual(self.trades(TickReader(self.path), SharedTransactor()),
+                         self.trades([self.scaled(tick) for tick in self.ticks], SharedTransactor()))
+
+    def test_convert_json(self):
+        source = os.path.join(self.dir.name, "ticks.json")
+        with open(source, "w") as f:
+            f.write("\n".join(json.dumps(tick) for tick in self.ticks))
+        self.assertEqual(convert_json(source, self.path, depth=3, scale=100), 3)
+        reader = TickReader(self.path)
+        self.assertEqual(reader.depth, 3)
+        self.assertEqual(reader.bid[2].tolist(), [[4630, 500], [4625, 1000], [0, 0]])
+
+
+if __name__ == '__main__':
+    unittest.main()